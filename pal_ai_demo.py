@@ -4,11 +4,29 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import time
 import random
 from datetime import datetime, timedelta
 import json
 import base64
+import os
+
+from pal_cache import ResultCache, file_hash, quarter_of
+from pal_contracts import build_contract_index, recover_contract_numbers
+from pal_csv import read_csv_parallel
+from pal_exceptions import ExceptionQueue, default_resolvers, resolve_exceptions
+from pal_jobs import JobManager, run_steps
+from pal_lineage import LineageLog
+from pal_lineups import diff_lineups, split_blended
+from pal_mapping import confirm_mapping, map_fields
+from pal_money import format_compact, format_currency, parse_currency
+from pal_pipeline import PipelineRun
+from pal_provider_api import PROVIDER_APIS, api_lineage, ingest_provider, start_server
+from pal_rollups import read_rollups, standard_rollup_frame, summarize, update_rollups
+from pal_schema import compact_fund_frame, compact_plan_frame, table_to_frame
+from pal_shards import collect_results, coordinate, rollup_shards, run_workers
+from pal_sources import SAMPLE_FILES, normalize_plans, read_provider_file
+from pal_sync import PLAN_COLUMNS, master_state, read_table, sync_to_master
+from pal_templates import TemplateRegistry, template_key
 
 # Configure page
 st.set_page_config(
@@ -198,7 +216,6 @@ with st.container():
 st.session_state.demo_stage = selected_stage
 
 # Generate mock PAL data
-@st.cache_data
 def generate_mock_pal_data():
     """Generate realistic mock PAL data with various quality issues"""
 
@@ -247,10 +264,9 @@ def generate_mock_pal_data():
             "processing_time_hours": round(random.uniform(0.5, 8.0), 1)
         })
 
-    return pd.DataFrame(plans_data)
+    return compact_plan_frame(pd.DataFrame(plans_data))
 
 # Generate fund mapping data
-@st.cache_data
 def generate_fund_mapping_data():
     """Generate fund mapping data with mismatches"""
 
@@ -279,12 +295,294 @@ def generate_fund_mapping_data():
             "asset_value": random.randint(10000, 5000000)
         })
 
-    return pd.DataFrame(funds_data)
+    return compact_fund_frame(pd.DataFrame(funds_data))
+
+def load_contract_index():
+    """Contract index over the prior-quarter sample file and the master database"""
+    prior_plans, _ = read_provider_file(os.path.join(SAMPLE_DATA_DIR, "fidelity_prior_quarter_pal.csv"))
+    history = [normalize_plans(prior_plans, "Fidelity")]
+    master_plans = read_table("plans")
+    if len(master_plans):
+        history.append(master_plans.rename(columns={db: field for field, db in PLAN_COLUMNS.items()}))
+    return build_contract_index(pd.concat(history, ignore_index=True))
+
+def match_incoming_plans(incoming_plans):
+    """Match incoming PAL plans against the master plan list"""
+    recovered = recover_contract_numbers(
+        incoming_plans.rename(columns={'Participants': 'Participant_Count'}),
+        load_contract_index()
+    )
+    return pd.DataFrame({
+        'PAL Plan': list(incoming_plans['Plan_Name']),
+        'Contract': list(recovered['Contract_Number'].fillna('')),
+        'Contract Source': list(recovered['Contract_Source']),
+        'Matched Plan': ['ABC Corp 401(k)', 'XYZ Co. Retirement Plan', 'DEF Industries 401(k)', 'New Plan'],
+        'Confidence': [94.8, 87.2, 99.1, 0.0],
+        'Action': ['Auto-Sync', 'Review Required', 'Auto-Sync', 'Manual Setup']
+    })
+
+# Generate prior/current quarter fund lineups
+def generate_mock_lineups():
+    """Two quarters of fund lineups for complex plans, some blended across providers"""
+    families = ["American Funds", "Vanguard", "Fidelity", "T. Rowe Price", "BlackRock"]
+    universe = [(f"{family} Fund {n}", f"{family[0]}{family.split()[-1][0]}{n:03d}X") for family in families for n in range(100)]
+    providers = ["Fidelity", "Vanguard", "T. Rowe Price", "Principal", "Empower"]
+    as_of = datetime.now().date()
+
+    rows = []
+    for i in range(300):
+        contract = f"CNT-{10000 + i}"
+        provider = random.choice(providers)
+        second_provider = random.choice([p for p in providers if p != provider]) if random.random() < 0.15 else None
+        prior = random.sample(universe, random.randint(20, 140))
+        kept = [fund for fund in prior if random.random() > 0.05]
+        current = kept + random.sample([fund for fund in universe if fund not in prior], random.randint(0, 6))
+
+        for name, ticker in prior:
+            rows.append({"Quarter": "prior", "Contract_Number": contract, "Ticker": ticker, "Fund_Name": name,
+                         "Provider": provider, "Fund_Value": random.randint(1000, 500000) * 100,
+                         "As_Of_Date": as_of - timedelta(days=91)})
+        for name, ticker in current:
+            old_fund = random.random() < 0.02
+            rows.append({"Quarter": "current", "Contract_Number": contract, "Ticker": ticker, "Fund_Name": name,
+                         "Provider": second_provider if second_provider and random.random() < 0.3 else provider,
+                         "Fund_Value": 0 if old_fund else random.randint(1000, 500000) * 100,
+                         "As_Of_Date": as_of - timedelta(days=365 if old_fund else 0)})
+    return pd.DataFrame(rows)
+
+def diff_quarter_lineups(lineups_hash, lineups):
+    """Quarter-over-quarter lineup diff and blended split, shared via the result cache per lineup content"""
+    computed = []
+
+    def diff(part):
+        if not computed:
+            computed.extend(diff_lineups(
+                lineups[lineups['Quarter'] == 'current'],
+                lineups[lineups['Quarter'] == 'prior']
+            ))
+        return computed[part]
+
+    holdings = load_cached_frame("lineup-holdings", lineups_hash, lambda: diff(0))
+    summary = load_cached_frame("lineup-summary", lineups_hash, lambda: diff(1))
+    return holdings, summary, split_blended(holdings, summary)
+
+# Shared on-disk result cache (one copy per quarter for every session)
+@st.cache_resource
+def get_result_cache():
+    """Arrow result cache keyed on provider, content hash, quarter and pipeline version"""
+    return ResultCache()
+
+def load_cached_frame(provider, content_hash, compute):
+    """Fetch a frame from the shared cache, computing it once per quarter"""
+    key = ResultCache.make_key(provider, content_hash, quarter_of(datetime.now()))
+    return table_to_frame(get_result_cache().get_or_compute(key, compute))
+
+def ingest_mock_pal_data():
+    """Generate this quarter's mock plan batch and fold it into the quarter's rollups as it lands"""
+    pal_data = generate_mock_pal_data()
+    quarter = quarter_of(datetime.now())
+    checks, _ = exception_checks(pal_data)
+    update_rollups(pal_data, exceptions=sum(mask.astype(int) for mask in checks.values()), quarter=quarter)
+    return pal_data
+
+def add_api_rollups(plans, api_name):
+    """Count synced API plans in this quarter's rollups, replacing any earlier count of the same plans"""
+    api = PROVIDER_APIS[api_name]
+    template_type = 'GraphQL API' if api['style'] == 'graphql' else 'REST API'
+    return update_rollups(standard_rollup_frame(plans, template_type), quarter=quarter_of(datetime.now()))
+
+def previous_quarter_totals():
+    """Rollup totals for the latest quarter before this one, or None without history"""
+    quarterly = summarize(read_rollups(), by='quarter')
+    earlier = quarterly[quarterly['quarter'] < quarter_of(datetime.now())]
+    return earlier.iloc[-1].to_dict() if len(earlier) else None
+
+# Learned per-template metadata (date formats, field mappings)
+@st.cache_resource
+def get_template_registry():
+    """Template registry shared by all sessions"""
+    return TemplateRegistry()
+
+SAMPLE_DATA_DIR = "sample_data"
+
+# Append-only record of where every standardized row came from
+@st.cache_resource
+def get_lineage_log():
+    """Lineage log with its background writer, shared by all sessions"""
+    return LineageLog()
+
+# Legacy flow step -> checkpointed pipeline stage
+PIPELINE_STEPS = {
+    "Uploading files to server...": "upload",
+    "Detecting file format...": "detect",
+    "AI template matching (400+ templates)...": "template",
+    "Smart field mapping...": "field_map",
+    "Data standardization...": "standardize",
+    "Quality validation...": "validate",
+    "Generating insights...": "insights",
+}
+
+def pipeline_steps(registry):
+    """Real work for the legacy flow: one resumable pipeline run per quarter over the sample files"""
+    files = {os.path.join(SAMPLE_DATA_DIR, file_name): provider for file_name, provider in SAMPLE_FILES.items()}
+    quarter = quarter_of(datetime.now())
+    run = PipelineRun(files, quarter, registry, lineage=get_lineage_log(), quarter=quarter,
+                      contract_index=load_contract_index())
+    return {step: (lambda stage=stage: run.run_stage(stage)) for step, stage in PIPELINE_STEPS.items()}
+
+# Local stand-in for the provider APIs (one server per process)
+@st.cache_resource
+def get_provider_api():
+    """Start the mock provider REST/GraphQL server seeded from sample_data"""
+    _server, base_url = start_server()
+    return base_url
+
+def api_sync_steps(base_url, api_name):
+    """Real work for the API flow: concurrent paginated ingest, then master database upsert"""
+    fetched = {}
+
+    def fetch():
+        fetched.update(ingest_provider(base_url, api_name))
+        return {key: fetched[key] for key in ('rows', 'seconds', 'rows_per_second', 'resume')}
+
+    def sync():
+        # Blank contract numbers are recovered from prior quarters before they would be held back
+        plans = recover_contract_numbers(fetched['plans'], load_contract_index())
+        stats = sync_to_master(plans=plans.drop(columns='Contract_Source'), funds=fetched['funds'])
+        stats['plans_recovered'] = int((plans['Contract_Source'] == 'recovered').sum())
+        add_api_rollups(plans, api_name)
+        lineage = get_lineage_log()
+        lineage.append(api_lineage(plans, fetched['funds'], api_name))
+        lineage.flush()
+        return stats
+
+    return {
+        "Fetching real-time data...": fetch,
+        "Synchronizing with master database...": sync,
+    }
+
+def sharded_quarter_steps(processes=2):
+    """Quarter-end run over the sample files: shard onto the work queue, drain with worker processes, commit"""
+    quarter = quarter_of(datetime.now())
+    files = {os.path.join(SAMPLE_DATA_DIR, file_name): provider for file_name, provider in SAMPLE_FILES.items()}
+    coordinated = {}
+
+    def shard():
+        coordinated.update(coordinate(files, quarter))
+        return coordinated
+
+    def process():
+        started = datetime.now()
+        shards, rows = run_workers(quarter, processes)
+        return {'shards': shards, 'rows': rows, 'processes': processes,
+                'seconds': (datetime.now() - started).total_seconds()}
+
+    def commit():
+        plans, funds = collect_results(quarter, coordinated['shards'])
+        stats = sync_to_master(plans=plans, funds=funds)
+        stats['plans_counted'] = rollup_shards(quarter)
+        return stats
+
+    return [
+        ("Sharding quarter files by provider and size...", shard),
+        ("Processing shards on worker processes...", process),
+        ("Committing shard results to master database...", commit),
+    ]
+
+# Older provider extracts use abbreviated headers for the same fields
+LEGACY_FIELD_NAMES = {
+    'Contract_Number': 'CONT_NUM',
+    'Plan_Name': 'PLN_NM',
+    'Asset_Value': 'AST_VAL',
+    'Participant_Count': 'PARTIC_CNT',
+    'As_Of_Date': 'DT_ASOF'
+}
+
+def profile_sample_fields(path, content_hash):
+    """Header and value-profile mapping of a legacy-layout file, shared via the result cache per file content"""
+    def profile():
+        raw = table_to_frame(read_csv_parallel(path))
+        legacy = raw[list(LEGACY_FIELD_NAMES)].rename(columns=LEGACY_FIELD_NAMES)
+        mapping_df, _ = map_fields(legacy)
+        return mapping_df
+
+    return load_cached_frame("legacy-field-mapping", content_hash, profile)
+
+def map_sample_fields(registry, provider="Fidelity", file_name="fidelity_messy_pal.csv"):
+    """Map a legacy-layout sample file; a confirmed template mapping skips reading it at all"""
+    columns = list(LEGACY_FIELD_NAMES.values())
+    key = template_key(provider, columns)
+    registry.register(key, provider, columns)
+    mapping = registry.field_mapping(key)
+    if mapping and mapping.get('confirmed'):
+        mapping_df, from_cache = map_fields(pd.DataFrame(columns=columns), registry, key)
+        return key, mapping_df, from_cache
+    path = os.path.join(SAMPLE_DATA_DIR, file_name)
+    return key, profile_sample_fields(path, file_hash(path)), False
+
+def exception_checks(pal_data, stale_after_days=60, low_quality_score=60):
+    """Per-issue boolean masks over the plan frame, plus days since each plan updated"""
+    stale_days = (pd.Timestamp(datetime.now().date()) - pal_data['last_updated'].astype('datetime64[ns]')).dt.days
+    checks = {
+        'Missing Contract Numbers': pal_data['contract_number'].fillna('') == '',
+        'Feed Disconnection': stale_days > stale_after_days,
+        'Data Quality Drop': pal_data['data_quality_score'] < low_quality_score,
+    }
+    return checks, stale_days
+
+def build_exception_queue(pal_data, stale_after_days=60, low_quality_score=60):
+    """Queue the exceptions detected in the plan frame, most urgent first"""
+    exception_queue = ExceptionQueue()
+    checks, stale_days = exception_checks(pal_data, stale_after_days, low_quality_score)
+    assets_cents = pal_data['assets_cents'].fillna(0)
+    for issue, mask in checks.items():
+        for idx in pal_data.index[mask]:
+            exception_queue.push(
+                pal_data.at[idx, 'client_name'],
+                issue,
+                pal_data.at[idx, 'provider'],
+                assets_cents=assets_cents[idx],
+                stale_days=stale_days[idx],
+                client_name=pal_data.at[idx, 'client_name'],
+                plan_name=pal_data.at[idx, 'plan_name'],
+                participants=pal_data.at[idx, 'participants'],
+                data_quality_score=pal_data.at[idx, 'data_quality_score']
+            )
+    return exception_queue
+
+# Shared background job executor (one per server process, shared by all sessions)
+@st.cache_resource
+def get_job_manager():
+    """Thread pool that runs long PAL work off the script thread"""
+    return JobManager(max_workers=4)
+
+@st.fragment(run_every=0.5)
+def render_job_progress(job_key, complete_flag):
+    """Poll a background job's counters and rerun the app once it finishes"""
+    job = get_job_manager().get(st.session_state.get(job_key))
+    if job is None:
+        st.session_state.pop(job_key, None)
+        return
+
+    snapshot = job.snapshot()
+    if snapshot['status'] == 'failed':
+        st.session_state.pop(job_key, None)
+        st.error(f"{snapshot['name']} failed: {snapshot['error']}")
+    elif snapshot['status'] == 'done':
+        st.session_state.pop(job_key, None)
+        st.session_state[complete_flag] = True
+        st.session_state[f"{complete_flag}_result"] = job.result
+        st.rerun()
+    else:
+        st.progress(
+            snapshot['progress'],
+            text=f"{snapshot['message']} ({snapshot['done']}/{snapshot['total']}, {snapshot['elapsed']:.1f}s)"
+        )
 
 # Main demo content
 if st.session_state.demo_stage == 'intro':
     # Load mock data
-    pal_data = generate_mock_pal_data()
+    pal_data = load_cached_frame("mock", "ingest_mock_pal_data", ingest_mock_pal_data)
 
     tabs = st.tabs(["Overview", "Challenges", "Scenarios"])
 
@@ -300,8 +598,9 @@ if st.session_state.demo_stage == 'intro':
         # KPI metrics
         col_kpi_1, col_kpi_2, col_kpi_3 = st.columns(3)
         total_templates = len(pal_data['template_type'].unique()) * 50  # Simulate 400+ templates
-        avg_processing_time = pal_data['processing_time_hours'].mean()
-        low_quality_pct = (pal_data['data_quality_score'] < 70).mean() * 100
+        kpis = summarize(read_rollups(quarter=quarter_of(datetime.now()))).iloc[0]
+        avg_processing_time = kpis['avg_processing_hours']
+        low_quality_pct = kpis['low_quality_pct']
 
         with col_kpi_1:
             st.metric("Total PAL Templates", f"{total_templates}+")
@@ -501,46 +800,75 @@ elif st.session_state.demo_stage == 'pre_ingestion':
         demo_mode = st.button("Simulate API Data Flow", type="primary")
 
         if demo_mode:
-            # Simulate API-based processing
-            with st.spinner("API Data Synchronization Running..."):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-
-                if "Legacy File Upload" in api_status:
-                    steps = [
-                        "Uploading files to server...",
-                        "Detecting file format...",
-                        "Analyzing template structure...",
-                        "AI template matching (400+ templates)...",
-                        "Smart field mapping...",
-                        "Data standardization...",
-                        "Quality validation...",
-                        "Generating insights..."
-                    ]
-                else:
-                    steps = [
-                        "Establishing API connection...",
-                        "Authenticating with provider...",
-                        "Fetching real-time data...",
-                        "Validating data schema...",
-                        "Applying AI transformations...",
-                        "Synchronizing with master database...",
-                        "Generating live insights..."
-                    ]
-
-                for i, step in enumerate(steps):
-                    status_text.text(step)
-                    progress_bar.progress((i + 1) / len(steps))
-                    time.sleep(0.8)
-
-                if "Legacy File Upload" in api_status:
-                    st.success("File Processing Complete!")
-                else:
-                    st.success("API Synchronization Complete!")
+            if "Legacy File Upload" in api_status:
+                steps = [
+                    "Uploading files to server...",
+                    "Detecting file format...",
+                    "Analyzing template structure...",
+                    "AI template matching (400+ templates)...",
+                    "Smart field mapping...",
+                    "Data standardization...",
+                    "Quality validation...",
+                    "Generating insights..."
+                ]
+            else:
+                steps = [
+                    "Establishing API connection...",
+                    "Authenticating with provider...",
+                    "Fetching real-time data...",
+                    "Validating data schema...",
+                    "Applying AI transformations...",
+                    "Synchronizing with master database...",
+                    "Generating live insights..."
+                ]
+
+            # Stages with real work attached; the rest are presentation steps
+            if "Legacy File Upload" in api_status:
+                registry = get_template_registry()
+                step_work = pipeline_steps(registry)
+            else:
+                step_work = api_sync_steps(get_provider_api(), api_status)
+
+            # Submit to the background executor; progress is polled below
+            st.session_state.ai_processed = False
+            st.session_state.api_flow_status = api_status
+            st.session_state.api_job_id = get_job_manager().submit(
+                "API Data Synchronization",
+                run_steps,
+                len(steps),
+                [(step, step_work.get(step)) for step in steps],
+                step_seconds=0.8
+            )
+
+        if st.session_state.get('api_job_id'):
+            render_job_progress('api_job_id', 'ai_processed')
+        elif st.session_state.get('ai_processed'):
+            if "Legacy File Upload" in st.session_state.get('api_flow_status', api_status):
+                st.success("File Processing Complete!")
+                stage_results = [result for result in (st.session_state.get('ai_processed_result') or {}).values() if result]
+                if stage_results:
+                    ran = sum(len(result['ran']) for result in stage_results)
+                    resumed = sum(len(result['skipped']) for result in stage_results)
+                    failed = sorted({os.path.basename(path) for result in stage_results for path in result['failed']})
+                    st.caption(
+                        f"Checkpointed run: {ran} file stages processed, {resumed} resumed from checkpoints"
+                        + (f", failed: {', '.join(failed)}" if failed else "")
+                    )
+            else:
+                st.success("API Synchronization Complete!")
+                sync_stats = (st.session_state.get('ai_processed_result') or {}).get("Synchronizing with master database...")
+                if sync_stats:
+                    # Holdings are keyed on (contract, ticker); feeds mirroring a flat file without a
+                    # ticker column, or plans awaiting contract recovery, are held back rather than guessed
+                    st.caption(
+                        f"Master database: {sync_stats['plans']} plans and {sync_stats['funds']} holdings upserted "
+                        f"({sync_stats['plans_recovered']} contract numbers recovered from prior quarters); "
+                        f"held back {sync_stats['plans_skipped']} plans without a contract number and "
+                        f"{sync_stats['funds_skipped']} holdings without a contract number or ticker"
+                    )
 
     with col2:
-        if demo_mode or st.session_state.get('ai_processed'):
-            st.session_state.ai_processed = True
+        if st.session_state.get('ai_processed'):
 
             # API vs File Processing Results
             st.subheader("API vs File Processing Results")
@@ -561,7 +889,13 @@ elif st.session_state.demo_stage == 'pre_ingestion':
                 with col_a:
                     st.metric("Data Freshness", "Real-time", "Live updates")
                 with col_b:
-                    st.metric("Processing Time", "2 min", "Per sync")
+                    fetch_stats = (st.session_state.get('ai_processed_result') or {}).get("Fetching real-time data...")
+                    if fetch_stats:
+                        elapsed = fetch_stats['seconds']
+                        elapsed_label = f"{elapsed * 1000:.0f} ms" if elapsed < 1 else f"{elapsed:.1f} s"
+                        st.metric("Processing Time", elapsed_label, f"{fetch_stats['rows_per_second']:,.0f} rows/s")
+                    else:
+                        st.metric("Processing Time", "2 min", "Per sync")
                 with col_c:
                     st.metric("Error Rate", "1.1%", "Auto-resolved")
                 with col_d:
@@ -617,12 +951,15 @@ elif st.session_state.demo_stage == 'pre_ingestion':
             # Data transformation visualization
             if "Legacy File Upload" in api_status:
                 st.subheader("File-Based Field Mapping")
-                mapping_data = {
-                    'PAL Field': ['CONT_NUM', 'PLN_NM', 'AST_VAL', 'PARTIC_CNT', 'DT_ASOF'],
-                    'Standard Field': ['Contract_Number', 'Plan_Name', 'Asset_Value', 'Participant_Count', 'As_Of_Date'],
-                    'Confidence': [99.8, 94.2, 99.9, 98.1, 87.3],
-                    'Transformation': ['Direct Map', 'Text Clean', 'Currency Parse', 'Number Parse', 'Date Standard']
-                }
+                registry = get_template_registry()
+                mapping_template, mapping_data, mapping_cached = map_sample_fields(registry)
+                if mapping_cached:
+                    st.caption(f"Known template {mapping_template}: confirmed mapping reused, profiling skipped")
+                else:
+                    st.caption(f"New template {mapping_template}: mapped by header similarity and value profiling")
+                    if st.button("Confirm Field Mapping"):
+                        version = confirm_mapping(registry, mapping_template, mapping_data)
+                        st.success(f"Mapping v{version} saved for {mapping_template}")
             else:
                 st.subheader("API Data Standardization")
                 mapping_data = {
@@ -722,27 +1059,46 @@ elif st.session_state.demo_stage == 'post_ingestion':
             'Contract_Number': ['CNT-45289', '', 'CNT-78934', 'CNT-12456'],
             'Plan_Name': ['ABC Corp 401K Plan', 'XYZ Company Retirement', 'DEF Inc 401(k) Plan', 'GHI Corp Plan'],
             'Client_Name': ['ABC Corporation', 'XYZ Company LLC', 'DEF Industries', 'GHI Corp'],
+            'Provider': ['Fidelity', 'Fidelity', 'Fidelity', 'Fidelity'],
+            'Participants': [1250, 445, 2600, 900],
             'Assets': ['$2.5M', '$890K', '$5.2M', '$1.8M']
         })
 
         st.dataframe(incoming_plans, use_container_width=True)
+        incoming_total = parse_currency(incoming_plans['Assets']).sum()
+        st.caption(f"Total incoming assets: {format_currency(incoming_total)}")
 
         if st.button("Run AI Matching", type="primary"):
-            with st.spinner("AI analyzing plan relationships..."):
-                time.sleep(2)
-                st.session_state.matching_complete = True
-                st.success("Matching complete!")
+            # Results are shared across sessions; the job only computes on a cache miss.
+            # Matching reads the master plans, so a sync invalidates the cached result.
+            result_cache = get_result_cache()
+            incoming_hash = str(pd.util.hash_pandas_object(incoming_plans, index=False).sum())
+            matching_key = ResultCache.make_key("incoming", f"{incoming_hash}:{master_state()}", quarter_of(datetime.now()))
+            st.session_state.matching_complete = False
+            st.session_state.matching_key = matching_key
+            st.session_state.matching_job_id = get_job_manager().submit(
+                "AI Matching",
+                run_steps,
+                1,
+                [("AI analyzing plan relationships...",
+                  lambda: result_cache.get_or_compute(matching_key, lambda: match_incoming_plans(incoming_plans)))],
+                step_seconds=2
+            )
+
+        if st.session_state.get('matching_job_id'):
+            render_job_progress('matching_job_id', 'matching_complete')
+        elif st.session_state.get('matching_complete'):
+            st.success("Matching complete!")
 
     with col2:
         st.markdown("#### AI Matching Results")
 
+        matching_table = None
         if st.session_state.get('matching_complete'):
-            matching_results = pd.DataFrame({
-                'PAL Plan': ['ABC Corp 401K Plan', 'XYZ Company Retirement', 'DEF Inc 401(k) Plan', 'GHI Corp Plan'],
-                'Matched Plan': ['ABC Corp 401(k)', 'XYZ Co. Retirement Plan', 'DEF Industries 401(k)', 'New Plan'],
-                'Confidence': [94.8, 87.2, 99.1, 0.0],
-                'Action': ['Auto-Sync', 'Review Required', 'Auto-Sync', 'Manual Setup']
-            })
+            matching_table = get_result_cache().get(st.session_state.get('matching_key'))
+
+        if matching_table is not None:
+            matching_results = table_to_frame(matching_table)
 
             # Color code by confidence (dark-friendly)
             def color_matching(row):
@@ -764,7 +1120,7 @@ elif st.session_state.demo_stage == 'post_ingestion':
     # Fund Association Intelligence
     st.subheader("Smart Fund Association")
 
-    fund_data = generate_fund_mapping_data()
+    fund_data = load_cached_frame("mock", "generate_fund_mapping_data", generate_fund_mapping_data)
 
     col1, col2 = st.columns(2)
 
@@ -800,6 +1156,29 @@ elif st.session_state.demo_stage == 'post_ingestion':
 
         st.info(f"AI reduced manual review from 100 to 8 funds (92% reduction)")
 
+    # Lineup diff across quarters for every plan at once
+    st.subheader("Complex Fund Lineup Changes")
+
+    lineups = load_cached_frame("mock", "generate_mock_lineups", generate_mock_lineups)
+    lineups_hash = str(pd.util.hash_pandas_object(lineups, index=False).sum())
+    lineup_holdings, lineup_summary, blended_sources = diff_quarter_lineups(lineups_hash, lineups)
+
+    col_l1, col_l2, col_l3, col_l4 = st.columns(4)
+    with col_l1:
+        st.metric("Plans Compared", f"{len(lineup_summary)}", f"{len(lineup_holdings):,} holdings")
+    with col_l2:
+        st.metric("Funds Added / Removed", f"{lineup_summary['Added'].sum()} / {lineup_summary['Removed'].sum()}")
+    with col_l3:
+        st.metric("Stale Funds Flagged", f"{lineup_summary['Stale'].sum()}")
+    with col_l4:
+        st.metric("Blended Lineups", f"{lineup_summary['Blended'].sum()}", f"{len(blended_sources)} source providers")
+
+    lineup_summary['Changes'] = lineup_summary['Added'] + lineup_summary['Removed'] + lineup_summary['Stale']
+    st.dataframe(
+        lineup_summary.sort_values('Changes', ascending=False).head(10),
+        use_container_width=True
+    )
+
     # Feed Management Intelligence
     st.subheader("Feed Management Intelligence")
 
@@ -869,13 +1248,53 @@ elif st.session_state.demo_stage == 'post_ingestion':
 
         st.dataframe(resolution_actions, use_container_width=True)
 
+        # Run the resolvers over every detected exception, largest/stalest plans first
+        pal_data = load_cached_frame("mock", "ingest_mock_pal_data", ingest_mock_pal_data)
+        exception_queue = build_exception_queue(pal_data)
+        st.caption(f"{len(exception_queue)} open exceptions queued by asset value and staleness")
+        if st.button("Resolve All Exceptions", type="primary"):
+            st.session_state.resolution_complete = False
+            st.session_state.resolution_job_id = get_job_manager().submit(
+                "Exception Resolution",
+                resolve_exceptions,
+                len(exception_queue),
+                exception_queue,
+                resolvers=default_resolvers(load_contract_index())
+            )
+
+        if st.session_state.get('resolution_job_id'):
+            render_job_progress('resolution_job_id', 'resolution_complete')
+        elif st.session_state.get('resolution_complete'):
+            resolved = pd.DataFrame(st.session_state.get('resolution_complete_result') or [])
+            statuses = resolved['Status'].value_counts() if len(resolved) else pd.Series(dtype=int)
+            st.success(
+                f"✅ {len(resolved)} exceptions handled in priority order: {statuses.get('Resolved', 0)} resolved, "
+                f"{statuses.get('Flagged', 0)} flagged for follow-up, {statuses.get('Manual', 0)} routed to analysts"
+            )
+            st.dataframe(resolved.head(10), use_container_width=True)
+
         # Rollback capability demo
         st.markdown("#### Smart Rollback Capability")
         if st.button("Demo: Rollback to Previous Quarter", type="primary"):
-            with st.spinner("AI analyzing historical data..."):
-                time.sleep(2)
-                st.success("✅ Successfully rolled back to Q2 2025 data")
-                st.info("All 47 plans restored to previous quarter values")
+            st.session_state.rollback_complete = False
+            st.session_state.rollback_job_id = get_job_manager().submit(
+                "Rollback",
+                run_steps,
+                1,
+                [("AI analyzing historical data...", previous_quarter_totals)]
+            )
+
+        if st.session_state.get('rollback_job_id'):
+            render_job_progress('rollback_job_id', 'rollback_complete')
+        elif st.session_state.get('rollback_complete'):
+            previous = (st.session_state.get('rollback_complete_result') or {}).get("AI analyzing historical data...")
+            if previous:
+                st.success(f"✅ {previous['quarter']} snapshot located for rollback")
+                st.info(f"{previous['quarter']} rollups hold {int(previous['plans']):,} plans "
+                        f"({format_compact(int(previous['assets_cents']))} in assets); "
+                        f"plan-level values are not restored in this demo")
+            else:
+                st.warning("No earlier quarter in the rollups to roll back to")
 
     # Exception handling with AI insights
     st.subheader("Intelligent Exception Handling")
@@ -924,6 +1343,22 @@ elif st.session_state.demo_stage == 'post_ingestion':
         </div>
         """, unsafe_allow_html=True)
 
+    # Source tracing from the lineage log
+    st.subheader("Data Lineage: Trace a Contract to Its Source")
+    trace_contract = st.text_input("Contract number", value="CNT-45289")
+    lineage = get_lineage_log().lookup(trace_contract.strip()) if trace_contract.strip() else None
+    if lineage is not None and len(lineage):
+        st.dataframe(
+            lineage.rename(columns={
+                'output_table': 'Output', 'output_row': 'Row', 'source_file': 'Source File',
+                'byte_offset': 'Byte Offset', 'template': 'Template', 'mapping_version': 'Mapping Version',
+                'transformation': 'Transformation', 'recorded_at': 'Recorded'
+            }).drop(columns=['contract_number', 'source_hash']),
+            use_container_width=True
+        )
+    else:
+        st.caption("No lineage recorded for this contract yet. Run the Legacy File Upload flow in Pre-Ingestion to record it.")
+
 else:  # future stage
     st.markdown("""
     <div class="solution-card">
@@ -961,12 +1396,45 @@ else:  # future stage
         unsafe_allow_html=True,
     )
 
+    # Quarter-end scale-out
+    st.subheader("Distributed Quarter-End Processing")
+    st.caption("Provider files are sharded by provider and size onto a work queue; worker processes on any host sharing the queue pull shards and commit results idempotently.")
+    if st.button("Run Sharded Quarter-End", type="primary"):
+        st.session_state.shards_complete = False
+        shard_steps = sharded_quarter_steps()
+        st.session_state.shards_job_id = get_job_manager().submit(
+            "Sharded Quarter-End",
+            run_steps,
+            len(shard_steps),
+            shard_steps
+        )
+
+    if st.session_state.get('shards_job_id'):
+        render_job_progress('shards_job_id', 'shards_complete')
+    elif st.session_state.get('shards_complete'):
+        shard_results = st.session_state.get('shards_complete_result') or {}
+        coordinated = shard_results.get("Sharding quarter files by provider and size...", {})
+        processed = shard_results.get("Processing shards on worker processes...", {})
+        committed = shard_results.get("Committing shard results to master database...", {})
+        col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+        with col_s1:
+            st.metric("Shards", len(coordinated.get('shards', [])), f"{coordinated.get('enqueued', 0)} newly queued")
+        with col_s2:
+            st.metric("Worker Processes", processed.get('processes', 0), f"{processed.get('shards', 0)} shards this run")
+        with col_s3:
+            st.metric("Rows Processed", f"{processed.get('rows', 0):,}", f"{processed.get('seconds', 0):.1f} s")
+        with col_s4:
+            st.metric("Plans Committed", f"{committed.get('plans', 0):,}", f"{committed.get('funds', 0):,} holdings")
+
     # Visual impact
     st.subheader("Impact Visualization")
 
     # Time savings chart
     categories = ['Data Processing', 'Plan Matching', 'Fund Mapping', 'Exception Handling', 'Quality Review']
-    current_times = [6.5, 2.1, 3.2, 2.3, 1.8]
+    quarterly = summarize(read_rollups(), by='quarter')
+    quarterly = quarterly[quarterly['quarter'] != 'unknown']
+    measured_hours = quarterly['avg_processing_hours'].dropna()
+    current_times = [measured_hours.iloc[-1] if len(measured_hours) else 6.5, 2.1, 3.2, 2.3, 1.8]
     ai_times = [0.25, 0.1, 0.3, 0.08, 0.2]
 
     fig = go.Figure()
@@ -994,6 +1462,41 @@ else:  # future stage
 
     st.plotly_chart(fig, use_container_width=True)
 
+    # Quarterly trend from the ingest-time rollups
+    if not quarterly.empty:
+        fig_trend = make_subplots(specs=[[{"secondary_y": True}]])
+        fig_trend.add_trace(go.Bar(
+            name='Plans Ingested',
+            x=quarterly['quarter'],
+            y=quarterly['plans'],
+            marker_color='#B0BEC5'
+        ), secondary_y=False)
+        fig_trend.add_trace(go.Scatter(
+            name='Avg Processing Time (hours)',
+            x=quarterly['quarter'],
+            y=quarterly['avg_processing_hours'],
+            mode='lines+markers',
+            line=dict(color='#FF7043')
+        ), secondary_y=True)
+        fig_trend.add_trace(go.Scatter(
+            name='Low Quality Plans (%)',
+            x=quarterly['quarter'],
+            y=quarterly['low_quality_pct'],
+            mode='lines+markers',
+            line=dict(color='#26C6DA')
+        ), secondary_y=True)
+        fig_trend.add_trace(go.Scatter(
+            name='Exceptions per Plan',
+            x=quarterly['quarter'],
+            y=quarterly['exceptions_per_plan'],
+            mode='lines+markers',
+            line=dict(color='#7E57C2')
+        ), secondary_y=True)
+        fig_trend.update_layout(title='Quarterly PAL Trends', xaxis_title='Quarter')
+        fig_trend.update_yaxes(title_text='Plans', secondary_y=False)
+        fig_trend.update_yaxes(title_text='Hours / % / Exceptions', secondary_y=True)
+        st.plotly_chart(fig_trend, use_container_width=True)
+
 
     # Call to action
     st.markdown("""
@@ -0,0 +1,128 @@
+"""Shared on-disk result cache for PAL pipeline outputs.
+
+Results are stored as Arrow IPC files keyed on (provider, file hash,
+quarter, pipeline version). Reads memory-map the file, so every session
+gets a zero-copy view of the same table instead of a pickled copy.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+
+import pyarrow as pa
+
+PIPELINE_VERSION = "4"
+DEFAULT_CACHE_DIR = os.environ.get("PAL_CACHE_DIR", ".pal_cache")
+DEFAULT_MAX_BYTES = int(os.environ.get("PAL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def quarter_of(when):
+    """Quarter label like '2025Q3' for a date/datetime"""
+    return f"{when.year}Q{(when.month - 1) // 3 + 1}"
+
+
+class ResultCache:
+    """Size-bounded Arrow table cache shared by every session on the host"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._key_locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(provider, content_hash, quarter, pipeline_version=PIPELINE_VERSION):
+        raw = "\x1f".join([provider, content_hash, quarter, str(pipeline_version)])
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.arrow")
+
+    def get(self, key):
+        """Memory-mapped table for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            source = pa.memory_map(path, "r")
+        except FileNotFoundError:
+            return None
+        try:
+            table = pa.ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            # Torn or foreign file; drop it and treat as a miss
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # mtime doubles as last-access time for eviction
+        except OSError:
+            pass
+        return table
+
+    def put(self, key, table):
+        """Atomically write a table and evict least recently used entries"""
+        if not isinstance(table, pa.Table):
+            table = pa.Table.from_pandas(table, preserve_index=False)
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        mapped = self.get(key)
+        return table if mapped is None else mapped
+
+    def get_or_compute(self, key, compute):
+        """Return the cached table, computing it at most once per key per process"""
+        table = self.get(key)
+        if table is not None:
+            return table
+        with self._locks_guard:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+        with lock:
+            table = self.get(key)
+            if table is None:
+                table = self.put(key, compute())
+        return table
+
+    def evict(self, keep=None):
+        """Delete oldest-accessed entries until the cache fits in max_bytes.
+
+        keep counts toward the budget but is never deleted itself.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not name.endswith(".arrow"):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            if path != keep:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
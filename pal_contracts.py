@@ -0,0 +1,78 @@
+"""Recovery of blank contract numbers from prior-quarter plans.
+
+Prior quarters are indexed on a composite key of provider, normalized
+client name, normalized plan name and participant band. Incoming rows with
+a blank contract number are filled with one hash join against that index,
+instead of a search per row. Keys that map to more than one contract are
+left out of the index so recovery never guesses.
+"""
+
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ["_provider", "_client_key", "_plan_key", "_participant_band"]
+
+# Legal-entity and filler words that vary between quarters for the same plan
+_ENTITY_WORDS = r"\b(?:inc|incorporated|llc|llp|lp|ltd|corp|corporation|co|company|companies|industries|group|the|plan)\b"
+
+
+def normalize_name(names):
+    """Vectorized name key: lowercase, 401(k) variants unified, entity words dropped"""
+    # Arrow-backed strings run these regexes in native code over the whole column
+    text = names.astype(pd.StringDtype("pyarrow")).str.lower()
+    text = text.str.replace(r"401\s*\(?k\)?", "401k", regex=True)
+    text = text.str.replace(r"[^a-z0-9 ]+", " ", regex=True)
+    text = text.str.replace(_ENTITY_WORDS, " ", regex=True)
+    return text.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def participant_band(counts):
+    """Power-of-two band, so small quarter-to-quarter changes keep the same key"""
+    values = pd.to_numeric(counts, errors="coerce").astype("float64")
+    bands = np.floor(np.log2(values.clip(lower=0) + 1))
+    return pd.Series(bands, index=counts.index).astype("Int16")
+
+
+def _with_keys(plans):
+    keyed = plans.copy()
+    keyed["_provider"] = keyed["Provider"].astype("string")
+    keyed["_client_key"] = normalize_name(keyed["Client_Name"])
+    keyed["_plan_key"] = normalize_name(keyed["Plan_Name"])
+    keyed["_participant_band"] = participant_band(keyed["Participant_Count"])
+    return keyed
+
+
+def _missing(contracts):
+    text = contracts.astype(pd.StringDtype("pyarrow")).str.strip()
+    return text.isna() | (text == "")
+
+
+def build_contract_index(prior_plans):
+    """Composite-key index of known contracts from prior-quarter plan frames"""
+    keyed = _with_keys(prior_plans[~_missing(prior_plans["Contract_Number"])])
+    keyed = keyed.dropna(subset=KEY_COLUMNS)
+    keyed["Contract_Number"] = keyed["Contract_Number"].astype("string").str.strip()
+    pairs = keyed[KEY_COLUMNS + ["Contract_Number"]].drop_duplicates()
+    unambiguous = ~pairs.duplicated(subset=KEY_COLUMNS, keep=False)
+    return pairs[unambiguous].reset_index(drop=True)
+
+
+def recover_contract_numbers(plans, index):
+    """Fill blank Contract_Number values from the index in one join.
+
+    Adds a Contract_Source column: 'provided', 'recovered' or 'missing'.
+    """
+    out = plans.copy()
+    missing = _missing(out["Contract_Number"])
+    out["Contract_Number"] = out["Contract_Number"].astype("string")
+    out["Contract_Source"] = np.where(missing, "missing", "provided")
+    if not missing.any() or index.empty:
+        return out
+
+    lookup = _with_keys(out.loc[missing, ["Provider", "Client_Name", "Plan_Name", "Participant_Count"]])
+    lookup["_row"] = lookup.index
+    matched = lookup.merge(index, on=KEY_COLUMNS, how="inner").set_index("_row")["Contract_Number"]
+
+    out.loc[matched.index, "Contract_Number"] = matched
+    out.loc[matched.index, "Contract_Source"] = "recovered"
+    return out
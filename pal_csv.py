@@ -0,0 +1,163 @@
+"""Parallel CSV reading straight from a memory-mapped file.
+
+The file is mapped once and cut into newline-aligned byte ranges. Each
+worker parses its range with Arrow's CSV reader directly from a zero-copy
+slice of the mapping, so no worker re-reads the file and no line is copied
+into Python strings before parsing. Arrow releases the GIL while parsing,
+so threads are enough to use every core.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+_SCAN_BYTES = 64 * 1024
+
+
+def _next_line_start(data, position):
+    """Offset just past the first newline at or after position (or len(data))"""
+    end = len(data)
+    while position < end:
+        window = data[position:position + _SCAN_BYTES]
+        hits = np.flatnonzero(window == 10)
+        if len(hits):
+            return position + int(hits[0]) + 1
+        position += len(window)
+    return end
+
+
+def _quote_count(data, begin, end):
+    return int(np.count_nonzero(data[begin:end] == 34))
+
+
+def split_ranges(data, start, chunk_bytes):
+    """Newline-aligned (begin, end) byte ranges covering data[start:].
+
+    A boundary is only placed where the number of quote characters before
+    it is even, so a quoted value containing newlines never straddles two
+    ranges ('""' escapes keep the parity intact).
+    """
+    ranges = []
+    begin = start
+    while begin < len(data):
+        target = begin + chunk_bytes
+        if target >= len(data):
+            ranges.append((begin, len(data)))
+            break
+        end = _next_line_start(data, target - 1)
+        quotes = _quote_count(data, begin, end)
+        while quotes % 2 and end < len(data):
+            next_end = _next_line_start(data, end)
+            quotes += _quote_count(data, end, next_end)
+            end = next_end
+        ranges.append((begin, end))
+        begin = end
+    return ranges
+
+
+def _csv_options(buffer, data, as_strings):
+    """Header end offset plus Arrow options for parsing data ranges of one file"""
+    header_end = _next_line_start(data, 0)
+    names = pacsv.read_csv(pa.BufferReader(buffer.slice(0, header_end))).column_names
+    convert = pacsv.ConvertOptions(column_types={name: pa.string() for name in names} if as_strings else None)
+    read_options = pacsv.ReadOptions(column_names=names, use_threads=False)
+    parse_options = pacsv.ParseOptions(newlines_in_values=True)
+    return header_end, names, read_options, parse_options, convert
+
+
+def read_csv_parallel(path, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES, as_strings=True):
+    """Read a CSV into an Arrow table using parallel workers over one mapping.
+
+    With as_strings every column is kept as text (like dtype=str), leaving
+    typed parsing to the normalization stage. If a range still fails to
+    parse (e.g. an unbalanced quote), the whole file is re-read with a
+    single parse of the same mapping.
+    """
+    if os.path.getsize(path) == 0:
+        return pa.table({})
+
+    with pa.memory_map(path, "r") as source:
+        buffer = source.read_buffer()
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        header_end, names, read_options, parse_options, convert = _csv_options(buffer, data, as_strings)
+
+        def parse(byte_range):
+            begin, end = byte_range
+            return pacsv.read_csv(pa.BufferReader(buffer.slice(begin, end - begin)),
+                                  read_options=read_options, parse_options=parse_options,
+                                  convert_options=convert)
+
+        ranges = split_ranges(data, header_end, chunk_bytes)
+        if not ranges:
+            return pa.table({name: pa.array([], pa.string()) for name in names})
+
+        try:
+            if len(ranges) == 1:
+                tables = [parse(ranges[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                    tables = list(pool.map(parse, ranges))
+            return pa.concat_tables(tables)
+        except pa.ArrowInvalid:
+            return pacsv.read_csv(pa.BufferReader(buffer.slice(header_end)),
+                                  read_options=pacsv.ReadOptions(column_names=names),
+                                  parse_options=parse_options, convert_options=convert)
+
+
+def csv_ranges(path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Record-aligned (begin, end) byte ranges of a CSV's data rows, for splitting it across workers"""
+    if os.path.getsize(path) == 0:
+        return []
+    with pa.memory_map(path, "r") as source:
+        data = np.frombuffer(source.read_buffer(), dtype=np.uint8)
+        return split_ranges(data, _next_line_start(data, 0), chunk_bytes)
+
+
+def read_csv_range(path, begin, end, as_strings=True):
+    """One byte range from csv_ranges as an Arrow table, parsed with the file's header"""
+    with pa.memory_map(path, "r") as source:
+        buffer = source.read_buffer()
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        _, _, read_options, parse_options, convert = _csv_options(buffer, data, as_strings)
+        return pacsv.read_csv(pa.BufferReader(buffer.slice(begin, end - begin)),
+                              read_options=read_options, parse_options=parse_options, convert_options=convert)
+
+
+def csv_range_bytes(path, begin, end):
+    """The header line plus one byte range from csv_ranges, as the bytes of a standalone CSV"""
+    with pa.memory_map(path, "r") as source:
+        buffer = source.read_buffer()
+        header_end = _next_line_start(np.frombuffer(buffer, dtype=np.uint8), 0)
+        return buffer.slice(0, header_end).to_pybytes() + buffer.slice(begin, end - begin).to_pybytes()
+
+
+def csv_header(path):
+    """Column names from a CSV's header line, as written"""
+    if os.path.getsize(path) == 0:
+        return []
+    with pa.memory_map(path, "r") as source:
+        buffer = source.read_buffer()
+        header_end = _next_line_start(np.frombuffer(buffer, dtype=np.uint8), 0)
+        return pacsv.read_csv(pa.BufferReader(buffer.slice(0, header_end))).column_names
+
+
+def record_offsets(path):
+    """Byte offset of every data record after the header, in parse order.
+
+    Newlines inside quoted values are not record boundaries and blank
+    lines are skipped, matching what read_csv_parallel returns row by row.
+    """
+    with pa.memory_map(path, "r") as source:
+        data = np.frombuffer(source.read_buffer(), dtype=np.uint8)
+        newlines = np.flatnonzero(data == 10)
+        quotes = np.flatnonzero(data == 34)
+        # A newline ends a record when an even number of quotes precede it
+        outside = np.searchsorted(quotes, newlines) % 2 == 0
+        starts = np.concatenate(([0], newlines[outside] + 1))
+        starts = starts[starts < len(data)]
+        starts = starts[(data[starts] != 10) & (data[starts] != 13)]
+    return starts[1:].astype(np.int64)
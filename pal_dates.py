@@ -0,0 +1,100 @@
+"""Vectorized normalization of provider date columns.
+
+The format of a column is inferred once from a sample and cached in the
+template registry; every later file from that template parses the whole
+column in one pass with the known format. Only values that do not match
+fall back to per-value dateutil parsing.
+"""
+
+import pandas as pd
+
+from pal_schema import DATE
+
+CANDIDATE_FORMATS = [
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+    "%m/%d/%y",
+    "%d/%m/%Y",
+    "%Y/%m/%d",
+    "%Y%m%d",
+    "%m-%d-%Y",
+    "%d.%m.%Y",
+    "%d-%b-%Y",
+    "%b %d, %Y",
+    "%B %d, %Y",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+]
+
+
+def infer_date_format(values, sample_size=200, min_hit_rate=0.5):
+    """Best candidate format for a sample of a column, or None"""
+    sample = pd.Series(values).dropna().astype(str).str.strip()
+    sample = sample[sample != ""].drop_duplicates()
+    if sample.empty:
+        return None
+    sample = sample.head(sample_size)
+
+    best_format, best_rate = None, 0.0
+    for fmt in CANDIDATE_FORMATS:
+        rate = pd.to_datetime(sample, format=fmt, errors="coerce").notna().mean()
+        if rate > best_rate:
+            best_format, best_rate = fmt, rate
+            if rate == 1.0:
+                break
+    return best_format if best_rate >= min_hit_rate else None
+
+
+def _parse_outlier(value):
+    try:
+        parsed = pd.to_datetime(value)
+    except (ValueError, OverflowError, TypeError):
+        return pd.NaT
+    if parsed is not pd.NaT and parsed.tzinfo is not None:
+        parsed = parsed.tz_convert(None)
+    return parsed
+
+
+def normalize_dates(values, registry=None, template=None, column=None, stats=None):
+    """Parse a column of provider dates into a date32 series.
+
+    When registry/template/column are given the inferred format is cached
+    there and reused. A cached format that matches fewer than half the
+    values is treated as template drift and re-inferred. If stats is a dict
+    it receives the format used and the outlier count.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    text = series.astype("string").str.strip()
+    present = text.notna() & (text != "")
+
+    use_cache = registry is not None and template is not None and column is not None
+    fmt = registry.date_format(template, column) if use_cache else None
+    inferred = fmt is None
+    if inferred:
+        fmt = infer_date_format(text[present])
+
+    if fmt is not None:
+        parsed = pd.to_datetime(text, format=fmt, errors="coerce")
+        if not inferred and parsed[present].notna().mean() < 0.5:
+            fmt = infer_date_format(text[present])
+            inferred = True
+            parsed = pd.to_datetime(text, format=fmt, errors="coerce") if fmt else pd.Series(pd.NaT, index=text.index)
+    else:
+        parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+
+    if use_cache and inferred and fmt is not None:
+        registry.set_date_format(template, column, fmt)
+
+    # Per-value fallback only for the rows the column format did not match
+    outliers = present & parsed.isna()
+    if outliers.any():
+        unique_values = text[outliers].unique()
+        fallback = {value: _parse_outlier(value) for value in unique_values}
+        parsed = parsed.copy()
+        parsed[outliers] = pd.to_datetime(text[outliers].map(fallback), errors="coerce")
+
+    if stats is not None:
+        stats["format"] = fmt
+        stats["outliers"] = int(outliers.sum())
+
+    return parsed.dt.date.astype(DATE)
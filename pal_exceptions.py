@@ -0,0 +1,241 @@
+"""Exception triage queue for one-click problem resolution.
+
+Exceptions are kept in a heap ordered by plan assets and staleness, so the
+largest and most out-of-date plans are resolved first. Repeats of the same
+issue for the same plan are merged. Resolvers run on a worker pool with a
+token-bucket rate limit per provider. An exception over its provider's
+limit is held back until its not-before time instead of blocking a worker.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from pal_contracts import recover_contract_numbers
+
+# Priority = ASSET_WEIGHT * log10(assets in dollars) + STALE_WEIGHT * log10(days stale).
+# Both on log scales with equal weights: a plan ten times larger is as urgent as one
+# ten times staler, so size still counts when staleness spans 1-90 days.
+ASSET_WEIGHT = 10.0
+STALE_WEIGHT = 10.0
+
+DEFAULT_RATE_PER_SECOND = 20.0
+DEFAULT_BURST = 5
+
+
+def exception_priority(assets_cents, stale_days):
+    """Higher is more urgent; a large plan outranks a small one that is merely staler.
+
+    >>> exception_priority(50_000_000_00, 1) > exception_priority(500_000_00, 60)
+    True
+    >>> exception_priority(500_000_00, 60) > exception_priority(500_000_00, 1)
+    True
+    """
+    dollars = max(int(assets_cents or 0) // 100, 0)
+    days = max(float(stale_days or 0), 0.0)
+    return ASSET_WEIGHT * math.log10(dollars + 1) + STALE_WEIGHT * math.log10(days + 1)
+
+
+class ExceptionQueue:
+    """Max-priority queue of plan exceptions, deduplicated per (plan, issue)"""
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self.merged = 0
+
+    def push(self, plan_id, issue, provider, assets_cents=0, stale_days=0, **details):
+        """Queue an exception; a repeat for the same plan and issue is merged"""
+        key = (plan_id, issue)
+        priority = exception_priority(assets_cents, stale_days)
+        existing = self._entries.get(key)
+        if existing is not None:
+            self.merged += 1
+            existing["occurrences"] += 1
+            existing["details"].update(details)
+            if priority <= existing["priority"]:
+                return
+            # Re-queue at the higher priority; the old heap entry is skipped on pop
+            existing["removed"] = True
+            details = {**existing["details"], **details}
+            occurrences = existing["occurrences"]
+        else:
+            occurrences = 1
+
+        entry = {
+            "plan_id": plan_id,
+            "issue": issue,
+            "provider": provider,
+            "assets_cents": int(assets_cents or 0),
+            "stale_days": float(stale_days or 0),
+            "priority": priority,
+            "occurrences": occurrences,
+            "details": dict(details),
+            "removed": False,
+        }
+        self._entries[key] = entry
+        heapq.heappush(self._heap, (-priority, next(self._counter), entry))
+
+    def pop(self):
+        """Most urgent exception, or None when empty"""
+        while self._heap:
+            _, _, entry = heapq.heappop(self._heap)
+            if not entry["removed"]:
+                del self._entries[(entry["plan_id"], entry["issue"])]
+                return entry
+        return None
+
+    def drain(self):
+        """All queued exceptions in priority order"""
+        entries = []
+        while True:
+            entry = self.pop()
+            if entry is None:
+                return entries
+            entries.append(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RateLimiter:
+    """Thread-safe token bucket that hands out reservations instead of blocking"""
+
+    def __init__(self, rate_per_second, burst):
+        self.rate = rate_per_second
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take the next token, borrowing ahead if needed; seconds until it may be used"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+# Resolvers return (status, outcome). Only the contract lookup can fix data
+# here; the others record what was detected and route it for follow-up.
+def _auto_reconnect(entry):
+    return "Flagged", f"No {entry['provider']} data for {entry['stale_days']:.0f} days; reconnect requested, advisor notified"
+
+
+def _auto_correct(entry):
+    score = entry["details"].get("data_quality_score")
+    return "Flagged", f"Quality score {score} below threshold; flagged for review" if score is not None else "Flagged for review"
+
+
+def _map_lineup(entry):
+    return "Flagged", "Lineup queued for mapping review"
+
+
+def _rollback_resync(entry):
+    return "Flagged", "Resync from prior quarter requested"
+
+
+def contract_resolver(contract_index):
+    """Missing Contract Numbers resolver backed by a pal_contracts index of prior quarters"""
+
+    def lookup(entry):
+        details = entry["details"]
+        plan = pd.DataFrame([{
+            "Contract_Number": None,
+            "Provider": entry["provider"],
+            "Client_Name": details.get("client_name", entry["plan_id"]),
+            "Plan_Name": details.get("plan_name"),
+            "Participant_Count": details.get("participants"),
+        }])
+        recovered = recover_contract_numbers(plan, contract_index).iloc[0]
+        if recovered["Contract_Source"] == "recovered":
+            return "Resolved", f"Recovered contract {recovered['Contract_Number']} from prior quarters"
+        return "Manual", "No unambiguous prior-quarter match; contract requested from provider"
+
+    return lookup
+
+
+def _request_contract(entry):
+    return "Manual", "Contract number requested from provider"
+
+
+# Issue -> resolver, matching the One-Click Problem Resolution actions
+RESOLVERS = {
+    "Feed Disconnection": _auto_reconnect,
+    "Data Quality Drop": _auto_correct,
+    "Missing Contract Numbers": _request_contract,
+    "Complex Fund Lineup": _map_lineup,
+    "Quarterly Sync Error": _rollback_resync,
+}
+
+
+def default_resolvers(contract_index=None):
+    """RESOLVERS, with contract numbers recovered from contract_index when given"""
+    resolvers = dict(RESOLVERS)
+    if contract_index is not None:
+        resolvers["Missing Contract Numbers"] = contract_resolver(contract_index)
+    return resolvers
+
+
+def resolve_exceptions(job, exception_queue, resolvers=None, max_workers=8, rate_limits=None):
+    """Drain the queue in priority order onto a worker pool.
+
+    rate_limits maps provider -> (rate_per_second, burst). An exception over
+    its provider's limit is deferred to its not-before time while other
+    providers' exceptions keep the workers busy. job may be None; when given
+    it is advanced once per resolved exception. Returns one result dict per
+    exception, in priority order.
+    """
+    resolvers = resolvers or RESOLVERS
+    rate_limits = rate_limits or {}
+    limiters = {}
+
+    def limiter_for(provider):
+        if provider not in limiters:
+            rate, burst = rate_limits.get(provider, (DEFAULT_RATE_PER_SECOND, DEFAULT_BURST))
+            limiters[provider] = RateLimiter(rate, burst)
+        return limiters[provider]
+
+    def run(entry):
+        resolver = resolvers.get(entry["issue"])
+        try:
+            status, outcome = resolver(entry) if resolver else ("Manual", "No resolver; routed to analyst")
+        except Exception as exc:
+            outcome, status = f"{type(exc).__name__}: {exc}", "Failed"
+        if job is not None:
+            job.advance(f"Resolved {entry['issue']} for {entry['plan_id']}")
+        return {
+            "Plan": entry["plan_id"],
+            "Provider": entry["provider"],
+            "Issue": entry["issue"],
+            "Priority": round(entry["priority"], 1),
+            "Occurrences": entry["occurrences"],
+            "Status": status,
+            "Outcome": outcome,
+        }
+
+    # Executor work queue is FIFO, so submitting in heap order preserves priority
+    entries = exception_queue.drain()
+    futures, deferred = {}, []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pal-resolver") as pool:
+        for order, entry in enumerate(entries):
+            delay = limiter_for(entry["provider"]).reserve()
+            if delay > 0:
+                entry["not_before"] = time.monotonic() + delay
+                heapq.heappush(deferred, (entry["not_before"], order, entry))
+            else:
+                futures[order] = pool.submit(run, entry)
+        # Only this dispatching thread waits out a provider's limit; workers stay free
+        while deferred:
+            not_before, order, entry = heapq.heappop(deferred)
+            time.sleep(max(0.0, not_before - time.monotonic()))
+            futures[order] = pool.submit(run, entry)
+        return [futures[order].result() for order in range(len(entries))]
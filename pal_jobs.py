@@ -0,0 +1,121 @@
+"""Background job execution for long-running PAL work.
+
+Jobs run on a shared thread pool so the Streamlit script thread is never
+blocked; the UI polls a job's counters by ID and re-renders progress.
+"""
+
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """A unit of background work with progress counters"""
+
+    def __init__(self, name, total_steps):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.total = total_steps
+        self.done = 0
+        self.message = "Queued..."
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def advance(self, message=None, steps=1):
+        """Record completed steps; called from the worker thread"""
+        with self._lock:
+            self.done = min(self.done + steps, self.total)
+            if message is not None:
+                self.message = message
+
+    def set_message(self, message):
+        with self._lock:
+            self.message = message
+
+    def snapshot(self):
+        """Consistent copy of the counters for rendering"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "status": self.status,
+                "done": self.done,
+                "total": self.total,
+                "progress": self.done / self.total if self.total else 1.0,
+                "message": self.message,
+                "error": self.error,
+                "elapsed": (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0,
+            }
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+class JobManager:
+    """Submits jobs to a thread pool and tracks them by ID"""
+
+    def __init__(self, max_workers=4, keep_finished=200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pal-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._keep_finished = keep_finished
+
+    def submit(self, name, fn, total_steps, *args, **kwargs):
+        """Run fn(job, *args, **kwargs) in the background and return the job ID"""
+        job = Job(name, total_steps)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.started_at = time.time()
+        job.status = "running"
+        try:
+            job.result = fn(job, *args, **kwargs)
+            with job._lock:
+                job.done = job.total
+                job.finished_at = time.time()
+                job.status = "done"
+        except Exception as exc:
+            with job._lock:
+                job.error = f"{type(exc).__name__}: {exc}"
+                job.message = traceback.format_exc(limit=3)
+                job.finished_at = time.time()
+                job.status = "failed"
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.finished]
+        excess = len(finished) - self._keep_finished
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.finished_at or 0)[:excess]:
+                del self._jobs[job.id]
+
+
+def run_steps(job, steps, step_seconds=0.0):
+    """Run (label, callable) steps in order, advancing the job after each.
+
+    Steps with no callable are narration only; step_seconds paces those so
+    the demo stays readable. Steps with real work are never slowed down.
+    """
+    results = {}
+    for label, step in steps:
+        job.set_message(label)
+        if step is not None:
+            results[label] = step()
+        elif step_seconds:
+            time.sleep(step_seconds)
+        job.advance(label)
+    return results
@@ -0,0 +1,234 @@
+"""Append-only lineage log tracing every normalized row back to its source.
+
+Each record names the output row's contract, source file and byte offset,
+template, mapping version and transformation. Callers hand records to a
+background writer and return immediately (append), then flush at their
+checkpoint boundary, before they record the work as done. A batch the
+writer fails to write is kept and retried with the next one, and flush
+raises while any remains unwritten.
+
+Records land in immutable, zstd-compressed Arrow IPC segments sorted by
+contract number, with repeated strings dictionary-encoded. A small SQLite
+index maps each contract to the (segment, row range) runs that hold it, so
+a lookup reads only the record batches it needs. Segments are never
+rewritten. Each appended frame is keyed on its content, so a rerun that
+appends the same records again writes nothing, while a reprocessed file
+with a new mapping appends new records next to the old ones.
+"""
+
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from pal_mapping import STANDARD_FIELDS, TRANSFORMATIONS
+from pal_schema import table_to_frame
+
+DEFAULT_LINEAGE_DIR = os.path.join(os.environ.get("PAL_DATA_DIR", ".pal_data"), "lineage")
+BATCH_ROWS = 50_000
+FLUSH_SECONDS = 1.0
+ROWS_PER_RECORD_BATCH = 8192
+
+LINEAGE_SCHEMA = pa.schema([
+    ("contract_number", pa.string()),
+    ("output_table", pa.dictionary(pa.int8(), pa.string())),
+    ("output_row", pa.int64()),
+    ("source_file", pa.dictionary(pa.int32(), pa.string())),
+    ("source_hash", pa.dictionary(pa.int32(), pa.string())),
+    ("byte_offset", pa.int64()),
+    ("template", pa.dictionary(pa.int32(), pa.string())),
+    ("mapping_version", pa.int32()),
+    ("transformation", pa.dictionary(pa.int32(), pa.string())),
+    ("recorded_at", pa.timestamp("ms")),
+])
+
+# Clustered on contract number, so a lookup is one range scan of the index
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lineage_segments (
+    segment_id INTEGER PRIMARY KEY,
+    name       TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS lineage_index (
+    contract_number TEXT NOT NULL,
+    segment_id      INTEGER NOT NULL,
+    first_row       INTEGER NOT NULL,
+    rows            INTEGER NOT NULL,
+    PRIMARY KEY (contract_number, segment_id, first_row)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lineage_batches (
+    batch_hash TEXT PRIMARY KEY,
+    segment_id INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+_WRITE_OPTIONS = pa.ipc.IpcWriteOptions(compression="zstd")
+
+
+def describe_transformation(fields, date_format=None):
+    """Human-readable transformation applied to a row's standard fields"""
+    steps = []
+    for field in fields:
+        if field not in STANDARD_FIELDS:
+            continue
+        kind = STANDARD_FIELDS[field]["kind"]
+        step = f"{field}: {TRANSFORMATIONS[kind]}"
+        if kind == "date" and date_format:
+            step += f" ({date_format})"
+        steps.append(step)
+    return "; ".join(steps)
+
+
+def lineage_records(frame, output_table, source_file, source_hash, template, mapping_version, transformation,
+                    offsets=None):
+    """Lineage rows for one normalized output frame (one per output row); offsets is None for non-file sources"""
+    if offsets is None:
+        offsets = np.full(len(frame), np.nan)
+    return pd.DataFrame({
+        "contract_number": frame["Contract_Number"].astype("string").to_numpy(),
+        "output_table": output_table,
+        "output_row": np.arange(len(frame), dtype=np.int64),
+        "source_file": source_file,
+        "source_hash": source_hash,
+        "byte_offset": pd.to_numeric(pd.Series(offsets), errors="coerce").astype("Int64").to_numpy(),
+        "template": template,
+        "mapping_version": int(mapping_version or 0),
+        "transformation": transformation,
+    })
+
+
+class LineageLog:
+    """Batched, append-only lineage writer with a contract-number index"""
+
+    def __init__(self, log_dir=DEFAULT_LINEAGE_DIR, batch_rows=BATCH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.log_dir = log_dir
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.segments_written = 0
+        self.rows_written = 0
+        self.error = None
+        self._failed = []
+        os.makedirs(log_dir, exist_ok=True)
+        self._index_path = os.path.join(log_dir, "index.db")
+        self._connect().close()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._run, name="pal-lineage-writer", daemon=True)
+        self._writer.start()
+
+    def append(self, records):
+        """Queue a frame of lineage records; returns without waiting for disk"""
+        if len(records):
+            batch_hash = hashlib.sha256(pd.util.hash_pandas_object(records, index=False).to_numpy().tobytes()).hexdigest()
+            self._queue.put((batch_hash, records.assign(recorded_at=pd.Timestamp.now().floor("ms"))))
+
+    def flush(self):
+        """Block until every queued record is written and indexed; raises if a batch could not be"""
+        self._queue.join()
+        if self._failed:
+            raise RuntimeError(f"Lineage records not written: {self.error}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self._index_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(INDEX_SCHEMA)
+        return conn
+
+    def _run(self):
+        pending, pending_rows = [], 0
+        while True:
+            try:
+                batch = self._queue.get(timeout=self.flush_seconds if pending else None)
+            except queue.Empty:
+                batch = None
+            if batch is not None:
+                pending.append(batch)
+                pending_rows += len(batch[1])
+            # Write once a batch fills up, or the queue has been quiet for flush_seconds
+            if pending and (batch is None or pending_rows >= self.batch_rows):
+                batches = self._failed + pending
+                try:
+                    self._write_segment(batches)
+                    self._failed, self.error = [], None
+                except Exception as exc:
+                    # Kept for the next write rather than dropped
+                    self._failed = batches
+                    self.error = f"{type(exc).__name__}: {exc}"
+                for _ in pending:
+                    self._queue.task_done()
+                pending, pending_rows = [], 0
+
+    def _write_segment(self, batches):
+        """Write the (batch hash, records) pairs not already in the log as one segment"""
+        batches = list(dict(batches).items())  # a batch queued twice is written once
+        conn = self._connect()
+        try:
+            hashes = [batch_hash for batch_hash, _ in batches]
+            written = {row[0] for row in conn.execute(
+                f"SELECT batch_hash FROM lineage_batches WHERE batch_hash IN ({', '.join('?' for _ in hashes)})",
+                hashes)}
+        finally:
+            conn.close()
+        batches = [(batch_hash, records) for batch_hash, records in batches if batch_hash not in written]
+        if not batches:
+            return
+        records = pd.concat([records for _, records in batches], ignore_index=True)
+        records = records.sort_values("contract_number", kind="stable", na_position="last").reset_index(drop=True)
+        table = pa.Table.from_pandas(records, schema=LINEAGE_SCHEMA, preserve_index=False)
+        segment = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:12]}.arrow"
+        path = os.path.join(self.log_dir, segment)
+        tmp_path = f"{path}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema, options=_WRITE_OPTIONS) as writer:
+                writer.write_table(table, max_chunksize=ROWS_PER_RECORD_BATCH)
+        os.replace(tmp_path, path)
+
+        # Rows are sorted, so each contract is one contiguous run
+        values = records["contract_number"].fillna("").to_numpy(dtype=object)
+        starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1]))) if len(values) else np.array([], dtype=int)
+        lengths = np.diff(np.append(starts, len(values)))
+        conn = self._connect()
+        try:
+            with conn:
+                segment_id = conn.execute("INSERT INTO lineage_segments (name) VALUES (?)", (segment,)).lastrowid
+                conn.executemany(
+                    "INSERT INTO lineage_index (contract_number, segment_id, first_row, rows) VALUES (?, ?, ?, ?)",
+                    [(values[s], segment_id, int(s), int(n)) for s, n in zip(starts, lengths) if values[s] != ""],
+                )
+                conn.executemany("INSERT INTO lineage_batches (batch_hash, segment_id) VALUES (?, ?)",
+                                 [(batch_hash, segment_id) for batch_hash, _ in batches])
+        finally:
+            conn.close()
+        self.segments_written += 1
+        self.rows_written += len(records)
+
+    def lookup(self, contract_number):
+        """Every lineage record for a contract, oldest first"""
+        conn = self._connect()
+        try:
+            runs = conn.execute(
+                "SELECT s.name, i.first_row, i.rows FROM lineage_index i "
+                "JOIN lineage_segments s USING (segment_id) WHERE i.contract_number = ? ORDER BY i.segment_id",
+                (contract_number,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        tables = []
+        for segment, first_row, rows in runs:
+            with pa.memory_map(os.path.join(self.log_dir, segment), "r") as source:
+                reader = pa.ipc.open_file(source)
+                # Only decompress the record batches that overlap the run
+                first_batch = first_row // ROWS_PER_RECORD_BATCH
+                last_batch = (first_row + rows - 1) // ROWS_PER_RECORD_BATCH
+                batches = [reader.get_batch(i) for i in range(first_batch, last_batch + 1)]
+                offset = first_row - first_batch * ROWS_PER_RECORD_BATCH
+                tables.append(pa.Table.from_batches(batches).slice(offset, rows))
+        if not tables:
+            return table_to_frame(LINEAGE_SCHEMA.empty_table())
+        return table_to_frame(pa.concat_tables(tables)).sort_values("recorded_at", kind="stable").reset_index(drop=True)
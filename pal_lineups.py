@@ -0,0 +1,166 @@
+"""Fund lineup diffing across quarters and blended-source separation.
+
+Every (plan, ticker) holding is encoded as one int64 key over shared
+plan/ticker codes, so a quarter's lineups for all plans become a single
+sorted key array. Added, removed and kept funds then fall out of numpy set
+operations over those arrays in one pass, with no per-plan loop. A ticker
+held through more than one provider keeps one holding row per provider, so
+blended plans can still be split by source.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+STATUS_ADDED = "Added"
+STATUS_REMOVED = "Removed"
+STATUS_KEPT = "Kept"
+
+# How incoming rows sharing a (plan, ticker, provider) holding are combined
+_ATTRIBUTE_AGG = {"Fund_Name": "first", "Fund_Value": "sum", "As_Of_Date": "max"}
+
+
+def _to_datetime64(dates):
+    """datetime64[ns] view of a date column, so min/max aggregations stay on the cython path"""
+    if isinstance(dates.dtype, pd.ArrowDtype) and pa.types.is_date(dates.dtype.pyarrow_dtype):
+        # Through Arrow: pandas' astype walks an Arrow-backed column value by value
+        days = pa.array(dates).cast(pa.date32()).to_numpy(zero_copy_only=False)
+        return pd.Series(days.astype("datetime64[ns]"), index=dates.index)
+    return pd.to_datetime(dates, errors="coerce")
+
+
+def _restore_dates(dates, dtype):
+    """datetime64 dates back in the caller's dtype (date32, or date objects for object columns)"""
+    if isinstance(dtype, pd.ArrowDtype):
+        restored = pa.array(dates, from_pandas=True).cast(dtype.pyarrow_dtype, safe=False)
+        return pd.Series(restored, index=dates.index, dtype=dtype)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return dates
+    return pd.Series(dates.dt.date.to_numpy(dtype=object), index=dates.index).where(dates.notna(), None)
+
+
+def _encode(incoming, prior):
+    plans, plan_labels = pd.factorize(pd.concat([incoming["Contract_Number"], prior["Contract_Number"]], ignore_index=True))
+    tickers, ticker_labels = pd.factorize(pd.concat([incoming["Ticker"], prior["Ticker"]], ignore_index=True))
+    width = np.int64(max(len(ticker_labels), 1))
+    keys = plans.astype(np.int64) * width + tickers.astype(np.int64)
+    return keys[:len(incoming)], keys[len(incoming):], plan_labels, ticker_labels, width
+
+
+def _sorted_unique(keys):
+    keys = np.sort(keys)
+    if len(keys) == 0:
+        return keys
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+
+def _sorted_member(needles, haystack):
+    """Membership of sorted unique needles in a sorted unique haystack"""
+    if len(haystack) == 0:
+        return np.zeros(len(needles), dtype=bool)
+    positions = np.searchsorted(haystack, needles).clip(max=len(haystack) - 1)
+    return haystack[positions] == needles
+
+
+def diff_lineups(incoming, prior, stale_days=90):
+    """Diff every plan's incoming lineup against its prior-quarter lineup.
+
+    Both frames need Contract_Number and Ticker; incoming may also carry
+    Provider, Fund_Name, Fund_Value and As_Of_Date. Status is decided per
+    (plan, ticker). Returns (holdings, summary): one row per (plan, ticker,
+    provider) with its status and stale flag, and one row per plan with
+    counts, its incoming Fund_Value total and whether its lineup is blended
+    across providers.
+    """
+    incoming = incoming.dropna(subset=["Contract_Number", "Ticker"])
+    prior = prior.dropna(subset=["Contract_Number", "Ticker"])
+    date_dtype = incoming["As_Of_Date"].dtype if "As_Of_Date" in incoming.columns else None
+    if date_dtype is not None:
+        incoming = incoming.assign(As_Of_Date=_to_datetime64(incoming["As_Of_Date"]))
+    incoming_keys, prior_keys, plan_labels, ticker_labels, width = _encode(incoming, prior)
+
+    current = _sorted_unique(incoming_keys)
+    previous = _sorted_unique(prior_keys)
+    is_added = ~_sorted_member(current, previous)
+    removed = previous[~_sorted_member(previous, current)]
+
+    all_keys = np.concatenate([current, removed])
+    status = np.full(len(all_keys), STATUS_KEPT, dtype=object)
+    status[:len(current)][is_added] = STATUS_ADDED
+    status[len(current):] = STATUS_REMOVED
+
+    holdings = pd.DataFrame({
+        "_key": all_keys,
+        "Contract_Number": plan_labels[all_keys // width],
+        "Ticker": ticker_labels[all_keys % width],
+        "Status": status,
+    })
+
+    # Attributes of the incoming holdings behind each key, one row per source provider
+    attributes = [col for col in _ATTRIBUTE_AGG if col in incoming.columns]
+    sources = ["_key"] + (["Provider"] if "Provider" in incoming.columns else [])
+    if len(sources) > 1 or attributes:
+        rows = incoming[sources[1:] + attributes].assign(_key=incoming_keys)
+        if attributes:
+            per_source = rows.groupby(sources, sort=False, dropna=False, observed=True).agg(
+                {col: _ATTRIBUTE_AGG[col] for col in attributes}
+            ).reset_index()
+        else:
+            per_source = rows[sources].drop_duplicates()
+        holdings = holdings.merge(per_source, on="_key", how="left")
+
+    holdings["Stale"] = _stale_mask(holdings, stale_days)
+    if date_dtype is not None:
+        holdings["As_Of_Date"] = _restore_dates(holdings["As_Of_Date"], date_dtype)
+    key_stale = holdings.groupby("_key", sort=False)["Stale"].any().reindex(all_keys).to_numpy(dtype=bool)
+    holdings = holdings.drop(columns="_key")
+
+    plan_codes = (all_keys // width).astype(np.int64)
+    n_plans = len(plan_labels)
+    summary = pd.DataFrame({
+        "Contract_Number": plan_labels,
+        "Funds": np.bincount(plan_codes[status != STATUS_REMOVED], minlength=n_plans),
+        "Added": np.bincount(plan_codes[status == STATUS_ADDED], minlength=n_plans),
+        "Removed": np.bincount(plan_codes[status == STATUS_REMOVED], minlength=n_plans),
+        "Stale": np.bincount(plan_codes[key_stale], minlength=n_plans),
+    })
+    if "Fund_Value" in incoming.columns:
+        totals = incoming.groupby("Contract_Number", observed=True)["Fund_Value"].sum()
+        summary["Fund_Value"] = summary["Contract_Number"].map(totals).fillna(0)
+    if "Provider" in incoming.columns:
+        providers = incoming.groupby("Contract_Number", observed=True)["Provider"].nunique()
+        summary["Providers"] = summary["Contract_Number"].map(providers).fillna(0).astype(int)
+        summary["Blended"] = summary["Providers"] > 1
+    return holdings, summary
+
+
+def _stale_mask(holdings, stale_days):
+    """Incoming funds with a zero balance or an as-of date well behind their plan's"""
+    stale = pd.Series(False, index=holdings.index)
+    active = holdings["Status"] != STATUS_REMOVED
+    if "Fund_Value" in holdings.columns:
+        stale |= active & (holdings["Fund_Value"].fillna(0) == 0)
+    if "As_Of_Date" in holdings.columns:
+        dates = holdings["As_Of_Date"]
+        plan_latest = dates.groupby(holdings["Contract_Number"]).transform("max")
+        stale |= active & ((plan_latest - dates).dt.days > stale_days)
+    return stale.to_numpy(dtype=bool)
+
+
+def split_blended(holdings, summary):
+    """Holdings of blended plans separated into one frame per source provider.
+
+    Raises ValueError if the split frames do not add back up to each blended
+    plan's incoming Fund_Value total.
+    """
+    blended_plans = summary.loc[summary["Blended"], "Contract_Number"]
+    blended = holdings[holdings["Contract_Number"].isin(blended_plans) & holdings["Provider"].notna()]
+    sources = {provider: frame.reset_index(drop=True) for provider, frame in blended.groupby("Provider", observed=True)}
+
+    if "Fund_Value" in summary.columns:
+        split_totals = blended.groupby("Contract_Number", observed=True)["Fund_Value"].sum()
+        expected = summary.loc[summary["Blended"]].set_index("Contract_Number")["Fund_Value"]
+        lost = expected.index[expected.to_numpy() != split_totals.reindex(expected.index).fillna(0).to_numpy()]
+        if len(lost):
+            raise ValueError(f"Blended split lost Fund_Value for {len(lost)} plans, e.g. {lost[0]}")
+    return sources
@@ -0,0 +1,179 @@
+"""Field mapping from provider columns to the standard PAL schema.
+
+Each source column is scored against each standard field by header
+similarity and by profiling a sample of its values (regex hit rates,
+numeric ranges, keyword hits). Confirmed mappings are stored per template
+in the registry, so repeat files from a known layout skip profiling.
+"""
+
+import re
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from pal_dates import infer_date_format
+from pal_money import parse_currency
+
+# Provider abbreviations expanded before header comparison
+ABBREVIATIONS = {
+    "cont": "contract", "ctr": "contract", "num": "number", "no": "number", "nbr": "number",
+    "pln": "plan", "nm": "name", "clnt": "client", "cli": "client", "ast": "asset",
+    "assets": "asset", "val": "value", "amt": "value", "partic": "participant",
+    "ppt": "participant", "participants": "participant", "cnt": "count", "dt": "date",
+    "asof": "as of", "fnd": "fund", "tkr": "ticker", "sym": "ticker",
+}
+
+STANDARD_FIELDS = {
+    "Contract_Number": {"kind": "contract", "aliases": ["contract number", "contract id", "plan number"]},
+    "Plan_Name": {"kind": "text", "aliases": ["plan name", "plan"], "keywords": r"plan|401|403|retirement|pension"},
+    "Client_Name": {"kind": "text", "aliases": ["client name", "sponsor name", "company"], "keywords": r"corp|inc|llc|company|co\b|industries"},
+    "Asset_Value": {"kind": "money", "aliases": ["asset value", "total asset", "plan asset"]},
+    "Participant_Count": {"kind": "count", "aliases": ["participant count", "participant", "number of participant"]},
+    "As_Of_Date": {"kind": "date", "aliases": ["as of date", "valuation date", "report date"]},
+    "Fund_Name": {"kind": "text", "aliases": ["fund name", "investment name"], "keywords": r"fund|index|portfolio|trust|growth"},
+    "Fund_Value": {"kind": "money", "aliases": ["fund value", "fund balance", "investment value"]},
+    "Ticker": {"kind": "ticker", "aliases": ["ticker", "symbol", "ticker symbol"]},
+}
+
+TRANSFORMATIONS = {
+    "contract": "Direct Map",
+    "text": "Text Clean",
+    "money": "Currency Parse",
+    "count": "Number Parse",
+    "date": "Date Standard",
+    "ticker": "Direct Map",
+}
+
+HEADER_WEIGHT = 0.6
+PROFILE_WEIGHT = 0.4
+MIN_CONFIDENCE = 0.5
+
+
+def _normalize_header(name):
+    tokens = re.findall(r"[a-z]+|\d+", re.sub(r"([a-z])([A-Z])", r"\1 \2", str(name)).lower())
+    return " ".join(ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def header_score(source, field):
+    """Similarity of a source header to a standard field and its aliases"""
+    source = _normalize_header(source)
+    candidates = [_normalize_header(field)] + STANDARD_FIELDS[field]["aliases"]
+    return max(SequenceMatcher(None, source, candidate).ratio() for candidate in candidates)
+
+
+def _numeric_profile(sample):
+    numbers = pd.to_numeric(sample.str.replace(r"[,$\s]", "", regex=True), errors="coerce")
+    return numbers.notna().mean(), numbers.dropna()
+
+
+def profile_score(sample, field):
+    """Fraction of sampled values that look like the field's kind"""
+    spec = STANDARD_FIELDS[field]
+    kind = spec["kind"]
+    if sample.empty:
+        return 0.0
+
+    if kind == "contract":
+        return sample.str.fullmatch(r"[A-Za-z]{2,4}-?\d{3,}").mean()
+    if kind == "ticker":
+        return sample.str.fullmatch(r"[A-Z]{3,5}X?").mean()
+    if kind == "date":
+        return 1.0 if infer_date_format(sample) is not None else 0.0
+    if kind == "money":
+        cents = parse_currency(sample)
+        # Plan and fund balances are well above participant-count ranges
+        return (cents.notna() & (cents >= 10_000 * 100)).mean()
+    if kind == "count":
+        numeric_rate, numbers = _numeric_profile(sample)
+        in_range = ((numbers % 1 == 0) & (numbers >= 1) & (numbers < 100_000)).sum() / len(sample)
+        return min(numeric_rate, in_range)
+
+    # Free text: mostly non-numeric, with field-specific keywords as a tie-breaker
+    numeric_rate, _ = _numeric_profile(sample)
+    keyword_rate = sample.str.contains(spec["keywords"], case=False, regex=True).mean()
+    return (1 - numeric_rate) * (0.5 + 0.5 * keyword_rate)
+
+
+def score_columns(df, sample_size=200):
+    """Long frame of (source, field, header, profile, confidence) scores"""
+    rows = []
+    for source in df.columns:
+        sample = df[source].dropna().astype(str).str.strip()
+        sample = sample[sample != ""].head(sample_size)
+        for field in STANDARD_FIELDS:
+            header = header_score(source, field)
+            profile = float(profile_score(sample, field))
+            rows.append({
+                "source": source,
+                "field": field,
+                "header": header,
+                "profile": profile,
+                "confidence": HEADER_WEIGHT * header + PROFILE_WEIGHT * profile,
+            })
+    return pd.DataFrame(rows)
+
+
+def _assign(scores):
+    """Greedy one-to-one assignment, best pairs first"""
+    mapping = {}
+    used_fields = set()
+    for row in scores.sort_values("confidence", ascending=False).itertuples():
+        if row.confidence < MIN_CONFIDENCE:
+            break
+        if row.source in mapping or row.field in used_fields:
+            continue
+        mapping[row.source] = {
+            "field": row.field,
+            "confidence": round(row.confidence * 100, 1),
+            "transformation": TRANSFORMATIONS[STANDARD_FIELDS[row.field]["kind"]],
+        }
+        used_fields.add(row.field)
+    return mapping
+
+
+def _mapping_frame(mapping, columns):
+    rows = [
+        {
+            "PAL Field": source,
+            "Standard Field": mapping[source]["field"],
+            "Confidence": mapping[source]["confidence"],
+            "Transformation": mapping[source]["transformation"],
+        }
+        for source in columns if source in mapping
+    ]
+    return pd.DataFrame(rows, columns=["PAL Field", "Standard Field", "Confidence", "Transformation"])
+
+
+def map_fields(df, registry=None, template=None):
+    """Map df's columns to standard fields.
+
+    Returns (mapping_frame, from_cache). A confirmed mapping for the
+    template is returned as-is when it covers the file's columns; only
+    unknown layouts are profiled.
+    """
+    if registry is not None and template is not None:
+        cached = registry.field_mapping(template)
+        if cached and cached.get("confirmed") and set(cached["columns"]) <= set(df.columns):
+            return _mapping_frame(cached["columns"], df.columns), True
+
+    mapping = _assign(score_columns(df))
+    return _mapping_frame(mapping, df.columns), False
+
+
+def confirm_mapping(registry, template, mapping_frame):
+    """Persist a reviewed mapping so the template skips profiling next time"""
+    columns = {
+        row["PAL Field"]: {
+            "field": row["Standard Field"],
+            "confidence": float(row["Confidence"]),
+            "transformation": row["Transformation"],
+        }
+        for _, row in mapping_frame.iterrows()
+    }
+    return registry.set_field_mapping(template, columns)
+
+
+def apply_mapping(df, mapping_frame):
+    """Rename mapped columns to their standard names and drop the rest"""
+    renames = dict(zip(mapping_frame["PAL Field"], mapping_frame["Standard Field"]))
+    return df[list(renames)].rename(columns=renames)
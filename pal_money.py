@@ -0,0 +1,99 @@
+"""Exact money handling as int64 minor units (cents).
+
+Provider files send amounts as '$2.5M', '(1,250.00)', '890K' or raw
+integers. parse_currency turns a whole column into cents in one vectorized
+pass with integer arithmetic only, so sums and reconciliation are exact
+without falling back to per-value Decimal objects.
+"""
+
+import numpy as np
+import pandas as pd
+
+_SUFFIX_EXPONENT = {"": 0, "K": 3, "M": 6, "B": 9}
+_AMOUNT_PATTERN = r"^(?P<sign>-)?(?P<whole>\d*)(?:\.(?P<frac>\d*))?(?P<suffix>[KMB])?$"
+# Fraction digits kept before rounding; enough for cents under a 'B' suffix
+_FRAC_DIGITS = 12
+# Whole-unit digits (after the suffix) that still fit in int64 cents
+_MAX_WHOLE_DIGITS = 16
+_MAX_UNITS = np.iinfo(np.int64).max // 100
+
+
+def parse_currency(values):
+    """Parse a column of currency values into a nullable Int64 series of cents.
+
+    Handles $, thousands separators, K/M/B suffixes, leading minus signs and
+    accounting parentheses. Fractions of a cent round half away from zero.
+    Unparseable values, and amounts too large for int64 cents, become <NA>.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+
+    if pd.api.types.is_integer_dtype(series.dtype) and not series.isna().any():
+        in_range = ((series >= -_MAX_UNITS) & (series <= _MAX_UNITS)).to_numpy()
+        cents = series.where(in_range, 0).astype("int64") * 100
+        return pd.Series(cents, index=series.index, dtype="Int64").mask(~in_range)
+
+    text = series.astype("string").str.strip().str.upper()
+    text = text.str.replace(r"[\s,$]", "", regex=True)
+    parens = text.str.startswith("(") & text.str.endswith(")")
+    text = text.mask(parens.fillna(False), text.str.slice(1, -1))
+
+    parts = text.str.extract(_AMOUNT_PATTERN)
+    has_digits = parts["whole"].str.len().fillna(0) + parts["frac"].str.len().fillna(0) > 0
+    exponent = parts["suffix"].fillna("").map(_SUFFIX_EXPONENT).to_numpy(dtype=np.int64)
+    whole_text = parts["whole"].str.lstrip("0")
+    fits = (whole_text.str.len().fillna(0).to_numpy(dtype=np.int64) + exponent) <= _MAX_WHOLE_DIGITS
+    valid = (parts["whole"].notna() & has_digits).to_numpy(dtype=bool) & fits
+
+    whole = pd.to_numeric(whole_text.where(valid, "0").replace("", "0")).to_numpy(dtype=np.int64)
+    frac = (
+        parts["frac"].fillna("")
+        .str.slice(0, _FRAC_DIGITS)
+        .str.pad(_FRAC_DIGITS, side="right", fillchar="0")
+    )
+    frac = pd.to_numeric(frac).to_numpy(dtype=np.int64)
+
+    # Scale whole units to cents and round the fraction to the nearest cent
+    divisor = 10 ** (_FRAC_DIGITS - 2 - exponent)
+    cents = whole * 10 ** (exponent + 2) + (frac + divisor // 2) // divisor
+
+    negative = (parts["sign"].notna() | parens).fillna(False).to_numpy(dtype=bool)
+    cents = np.where(negative, -cents, cents)
+
+    return pd.Series(cents, index=series.index, dtype="Int64").mask(~valid)
+
+
+def format_currency(cents):
+    """Full-precision display string like '$1,234.56' or '($5.00)'"""
+    cents = int(cents)
+    dollars, rem = divmod(abs(cents), 100)
+    text = f"${dollars:,}.{rem:02d}"
+    return f"({text})" if cents < 0 else text
+
+
+def format_compact(cents):
+    """Short display string like '$2.5M', '$890K' or '($1.5M)'"""
+    cents = int(cents)
+    for suffix, exponent in (("B", 9), ("M", 6), ("K", 3)):
+        unit = 10 ** (exponent + 2)
+        # Round to tenths of the unit first, so $999,999.99 reads $1M rather than $1000K
+        tenths = (abs(cents) * 10 + unit // 2) // unit
+        if tenths >= 10:
+            whole, tenth = divmod(tenths, 10)
+            text = f"${whole:,}{f'.{tenth}' if tenth else ''}{suffix}"
+            return f"({text})" if cents < 0 else text
+    return format_currency(cents)
+
+
+def reconcile(plans, funds, key, plan_amount, fund_amount):
+    """Compare each plan's total against the exact sum of its fund values.
+
+    Both amount columns must already be in cents; the result has the plan
+    total, fund total and difference per plan row, all Int64. Plans with no
+    funds get a <NA> fund total and difference.
+    """
+    fund_totals = funds.groupby(key, observed=True)[fund_amount].sum().rename("fund_total_cents")
+    result = plans[[key, plan_amount]].rename(columns={plan_amount: "plan_total_cents"})
+    result = result.join(fund_totals.astype("Int64"), on=key)
+    result["difference_cents"] = result["plan_total_cents"] - result["fund_total_cents"]
+    return result
+
@@ -0,0 +1,375 @@
+"""Checkpointed, resumable runs of the provider file pipeline.
+
+A run takes a batch of provider files through the pre-ingestion stages
+(upload, detect, template, field map, standardize, validate, insights).
+Units are named by source path digest plus file name, so two providers'
+files with the same name never share checkpoints. When a unit finishes,
+its input hash, output files and row counts go into the run's manifest.
+A rerun therefore skips units whose inputs are unchanged and picks up
+mid-batch after a crash. A file that fails is recorded and left out of
+later stages, and the rest of the batch carries on.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+from pal_cache import PIPELINE_VERSION, file_hash
+from pal_contracts import recover_contract_numbers
+from pal_csv import csv_range_bytes
+from pal_lineage import describe_transformation, lineage_records
+from pal_mapping import apply_mapping, map_fields
+from pal_money import reconcile
+from pal_rollups import standard_rollup_frame, update_rollups
+from pal_schema import table_to_frame
+from pal_sources import (FUND_FIELDS, PLAN_FIELDS, SOURCE_OFFSET, TEMPLATE_TYPES, detect_format, normalize_funds,
+                         normalize_plans, read_provider_file, source_columns)
+from pal_templates import template_key
+
+DEFAULT_RUNS_DIR = os.path.join(os.environ.get("PAL_DATA_DIR", ".pal_data"), "runs")
+
+STAGES = ["upload", "detect", "template", "field_map", "standardize", "validate", "insights"]
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# One lock per run directory, so two sessions resuming the same run take turns
+_run_locks = {}
+_run_locks_guard = threading.Lock()
+
+
+def _run_lock(run_dir):
+    with _run_locks_guard:
+        return _run_locks.setdefault(os.path.abspath(run_dir), threading.Lock())
+
+
+class CheckpointManifest:
+    """JSON record of finished (stage, file) units for one run"""
+
+    def __init__(self, path):
+        self.path = path
+        self.units = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.units = json.load(f)["units"]
+
+    def get(self, stage, name):
+        return self.units.get(f"{stage}/{name}")
+
+    def completed(self, stage, name, input_hash, run_dir):
+        """Entry for a finished unit with the same inputs and intact outputs, else None"""
+        entry = self.get(stage, name)
+        if entry is None or entry["status"] != STATUS_DONE or entry["input_hash"] != input_hash:
+            return None
+        if not all(os.path.exists(os.path.join(run_dir, output)) for output in entry["outputs"].values()):
+            return None
+        return entry
+
+    def record(self, stage, name, input_hash, status, outputs=None, rows=None, meta=None, output_hash=None, error=None):
+        entry = {
+            "status": status,
+            "input_hash": input_hash,
+            "output_hash": output_hash,
+            "outputs": outputs or {},
+            "rows": rows or {},
+            "meta": meta or {},
+            "error": error,
+            "finished_at": time.time(),
+        }
+        self.units[f"{stage}/{name}"] = entry
+        self._save()
+        return entry
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"pipeline_version": PIPELINE_VERSION, "units": self.units}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _digest(*parts):
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+def unit_name(path):
+    """Checkpoint name for a source file, unique per absolute path"""
+    return f"{_digest(os.path.abspath(path))[:10]}-{os.path.basename(path)}"
+
+
+class PipelineRun:
+    """One resumable run over a batch of {path: provider} files.
+
+    With a LineageLog, the standardize stage records where every output
+    row came from. With a quarter, it also folds each file's plans into
+    that quarter's rollups (once per plan). With a contract index
+    (pal_contracts.build_contract_index), blank contract numbers are
+    recovered from prior quarters during standardize. ranges maps a CSV
+    path to a (begin, end) byte range from pal_csv.csv_ranges; that unit
+    then ingests only the range, staged under the file's header, and its
+    lineage offsets still point into the full file.
+    """
+
+    def __init__(self, files, run_id, registry=None, runs_dir=DEFAULT_RUNS_DIR, lineage=None, quarter=None,
+                 contract_index=None, ranges=None):
+        self.files = dict(files)
+        self.ranges = dict(ranges or {})
+        self.registry = registry
+        self.lineage = lineage
+        self.quarter = quarter
+        self.contract_index = contract_index
+        # A different index can recover different contracts, so it is part of standardize's inputs
+        self._index_hash = "" if contract_index is None else hashlib.sha256(
+            pd.util.hash_pandas_object(contract_index, index=False).to_numpy().tobytes()).hexdigest()
+        self.run_dir = os.path.join(runs_dir, run_id)
+        self.manifest = CheckpointManifest(os.path.join(self.run_dir, "manifest.json"))
+
+    def run_stage(self, stage):
+        """Run one stage over every file, skipping units already checkpointed.
+
+        Returns the source paths that ran, were skipped as already complete,
+        failed (with their error) or were blocked by a failed earlier stage.
+        """
+        outcome = {"ran": [], "skipped": [], "failed": {}, "blocked": []}
+        finished = []
+        with _run_lock(self.run_dir):
+            for path, provider in self.files.items():
+                name = unit_name(path)
+                input_hash = None
+                try:
+                    # Hashing reads the source file, which may have gone missing since the run started
+                    input_hash = self._input_hash(stage, name, path)
+                    if input_hash is None:
+                        outcome["blocked"].append(path)
+                        continue
+                    if self.manifest.completed(stage, name, input_hash, self.run_dir):
+                        outcome["skipped"].append(path)
+                        continue
+                    outputs, rows, meta = _STAGE_FUNCTIONS[stage](self, name, provider, path)
+                except Exception as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+                    self.manifest.record(stage, name, input_hash, STATUS_FAILED, error=error)
+                    outcome["failed"][path] = error
+                    continue
+                output_hash = _digest(input_hash, json.dumps(meta, sort_keys=True),
+                                      *(file_hash(os.path.join(self.run_dir, out)) for out in sorted(outputs.values())))
+                finished.append((path, name, input_hash, outputs, rows, meta, output_hash))
+            self._checkpoint(stage, finished, outcome)
+        return outcome
+
+    def _checkpoint(self, stage, finished, outcome):
+        """Record finished units as done, once the lineage they appended is on disk"""
+        if stage == "standardize" and self.lineage is not None and finished:
+            try:
+                self.lineage.flush()
+            except RuntimeError as exc:
+                # Left unrecorded, so a rerun appends the same records again and the log writes them once
+                for path, name, input_hash, *_ in finished:
+                    self.manifest.record(stage, name, input_hash, STATUS_FAILED, error=str(exc))
+                    outcome["failed"][path] = str(exc)
+                return
+        for path, name, input_hash, outputs, rows, meta, output_hash in finished:
+            self.manifest.record(stage, name, input_hash, STATUS_DONE, outputs, rows, meta, output_hash)
+            outcome["ran"].append(path)
+
+    def _input_hash(self, stage, name, path):
+        """Source file hash for the first stage, else the previous stage's output hash (None if it has not finished)"""
+        index = STAGES.index(stage)
+        if index == 0:
+            if path in self.ranges:
+                staged = hashlib.sha256(csv_range_bytes(path, *self.ranges[path])).hexdigest()
+                return _digest(stage, PIPELINE_VERSION, staged)
+            return _digest(stage, PIPELINE_VERSION, file_hash(path))
+        upstream = self.manifest.get(STAGES[index - 1], name)
+        if upstream is None or upstream["status"] != STATUS_DONE:
+            return None
+        if stage == "standardize":
+            return _digest(stage, PIPELINE_VERSION, upstream["output_hash"], self._index_hash)
+        return _digest(stage, PIPELINE_VERSION, upstream["output_hash"])
+
+    def entry(self, stage, name):
+        return self.manifest.get(stage, name)
+
+    def output_path(self, stage, name, label):
+        return os.path.join(self.run_dir, self.entry(stage, name)["outputs"][label])
+
+    def read_output(self, stage, name, label):
+        """Checkpointed Arrow output as a frame (memory-mapped)"""
+        with pa.memory_map(self.output_path(stage, name, label), "r") as source:
+            return table_to_frame(pa.ipc.open_file(source).read_all())
+
+    def write_output(self, stage, name, label, frame):
+        """Atomically write a frame as Arrow IPC; returns its path relative to the run"""
+        relative = os.path.join(stage, f"{name}.{label}.arrow")
+        path = os.path.join(self.run_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        return relative
+
+
+def _upload(run, name, provider, path):
+    relative = os.path.join("upload", name)
+    target = os.path.join(run.run_dir, relative)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    offset_shift = 0
+    if path in run.ranges:
+        begin, end = run.ranges[path]
+        data = csv_range_bytes(path, begin, end)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        # Staged offsets past the header map back to the range's place in the source file
+        offset_shift = begin - (len(data) - (end - begin))
+    else:
+        shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+    meta = {"provider": provider, "sha256": file_hash(target), "offset_shift": offset_shift}
+    return {"file": relative}, {"bytes": os.path.getsize(target)}, meta
+
+
+def _detect(run, name, provider, path):
+    staged = run.output_path("upload", name, "file")
+    plans, funds = read_provider_file(staged, offsets=True)
+    offsets = pd.DataFrame({
+        "table": ["plans"] * len(plans) + ["funds"] * len(funds),
+        "offset": pd.concat([plans.pop(SOURCE_OFFSET), funds.pop(SOURCE_OFFSET)], ignore_index=True).astype("Int64"),
+    })
+    outputs = {
+        "plans": run.write_output("detect", name, "plans", plans),
+        "funds": run.write_output("detect", name, "funds", funds),
+        "offsets": run.write_output("detect", name, "offsets", offsets),
+    }
+    return outputs, {"plans": len(plans), "funds": len(funds)}, {"format": detect_format(staged)}
+
+
+def _template(run, name, provider, path):
+    # Keyed on the header as the provider wrote it; the detect outputs already use standard names
+    columns = source_columns(run.output_path("upload", name, "file"), run.entry("detect", name)["meta"]["format"])
+    key = template_key(provider, columns)
+    known = run.registry is not None and run.registry.get(key) is not None
+    if run.registry is not None:
+        run.registry.register(key, provider, columns)
+    return {}, {}, {"template": key, "known": known}
+
+
+def _field_map(run, name, provider, path):
+    template = run.entry("template", name)["meta"]["template"]
+    mapping, from_cache = map_fields(run.read_output("detect", name, "plans"), run.registry, template)
+    fund_mapping, _ = map_fields(run.read_output("detect", name, "funds"))
+    outputs = {
+        "mapping": run.write_output("field_map", name, "mapping", mapping),
+        "fund_mapping": run.write_output("field_map", name, "fund_mapping", fund_mapping),
+    }
+    mapped = int(mapping["Standard Field"].notna().sum()) + int(fund_mapping["Standard Field"].notna().sum())
+    return outputs, {"fields": len(mapping) + len(fund_mapping), "mapped": mapped}, {"from_cache": bool(from_cache)}
+
+
+def _mapped(run, name, label, mapping_label, fields):
+    """Detect output renamed by the field_map stage's mapping; unmapped fields come back blank"""
+    frame = apply_mapping(run.read_output("detect", name, label), run.read_output("field_map", name, mapping_label))
+    return frame.reindex(columns=fields)
+
+
+def _standardize(run, name, provider, path):
+    template = run.entry("template", name)["meta"]["template"]
+    plans = normalize_plans(_mapped(run, name, "plans", "mapping", PLAN_FIELDS), provider, run.registry, template)
+    funds = normalize_funds(_mapped(run, name, "funds", "fund_mapping", FUND_FIELDS), provider, run.registry,
+                            template)
+    if run.contract_index is not None:
+        plans = recover_contract_numbers(plans, run.contract_index)
+    outputs = {
+        "plans": run.write_output("standardize", name, "plans", plans),
+        "funds": run.write_output("standardize", name, "funds", funds),
+    }
+    if run.quarter is not None:
+        # Keyed per plan, so neither a rerun nor another ingest path counts a plan twice
+        file_format = run.entry("detect", name)["meta"]["format"]
+        update_rollups(standard_rollup_frame(plans, TEMPLATE_TYPES.get(file_format, file_format)), quarter=run.quarter)
+    if run.lineage is not None:
+        _record_lineage(run, name, path, template, plans, funds)
+    recovered = int((plans["Contract_Source"] == "recovered").sum()) if "Contract_Source" in plans.columns else 0
+    return outputs, {"plans": len(plans), "funds": len(funds)}, {"contracts_recovered": recovered}
+
+
+def _record_lineage(run, name, path, template, plans, funds):
+    """Append one lineage record per standardized row; run_stage flushes them before checkpointing the unit"""
+    mapping = run.registry.field_mapping(template) if run.registry is not None else None
+    date_format = run.registry.date_format(template, "As_Of_Date") if run.registry is not None else None
+    offsets = run.read_output("detect", name, "offsets")
+    offsets["offset"] += run.entry("upload", name)["meta"].get("offset_shift", 0)
+    source = {
+        "source_file": path,
+        "source_hash": run.entry("upload", name)["meta"]["sha256"],
+        "template": template,
+        "mapping_version": (mapping or {}).get("version", 0),
+    }
+    run.lineage.append(pd.concat([
+        lineage_records(frame, label, transformation=describe_transformation(fields, date_format),
+                        offsets=offsets.loc[offsets["table"] == label, "offset"].to_numpy(), **source)
+        for label, frame, fields in (("plans", plans, PLAN_FIELDS), ("funds", funds, FUND_FIELDS))
+    ], ignore_index=True))
+
+
+# (frame label, column, issue) checks run by the validate stage
+_VALIDATIONS = [
+    ("plans", "Contract_Number", "Missing contract number"),
+    ("plans", "Asset_Value", "Unparseable asset value"),
+    ("plans", "As_Of_Date", "Unparseable as-of date"),
+    ("funds", "Ticker", "Missing ticker"),
+    ("funds", "Fund_Value", "Unparseable fund value"),
+]
+
+
+def _validate(run, name, provider, path):
+    frames = {label: run.read_output("standardize", name, label) for label in ("plans", "funds")}
+    issues = []
+    for label, column, issue in _VALIDATIONS:
+        rows = frames[label].index[frames[label][column].isna()]
+        issues.append(pd.DataFrame({"Table": label, "Row": rows, "Field": column, "Issue": issue}))
+    # Exact in cents, so any nonzero difference is a real gap in the fund lineup
+    totals = reconcile(frames["plans"], frames["funds"], "Contract_Number", "Asset_Value", "Fund_Value")
+    rows = frames["plans"].index[(totals["difference_cents"] != 0).fillna(False).to_numpy()]
+    issues.append(pd.DataFrame({"Table": "plans", "Row": rows, "Field": "Asset_Value",
+                                "Issue": "Fund values do not sum to plan assets"}))
+    issues = pd.concat(issues, ignore_index=True)
+    outputs = {"issues": run.write_output("validate", name, "issues", issues)}
+    return outputs, {"issues": len(issues)}, {"by_issue": issues["Issue"].value_counts().to_dict()}
+
+
+def _insights(run, name, provider, path):
+    plans = run.read_output("standardize", name, "plans")
+    meta = {
+        "provider": provider,
+        "format": run.entry("detect", name)["meta"]["format"],
+        "template": run.entry("template", name)["meta"]["template"],
+        "plans": len(plans),
+        "funds": run.entry("standardize", name)["rows"]["funds"],
+        "assets_cents": int(plans["Asset_Value"].fillna(0).sum()),
+        "issues": run.entry("validate", name)["rows"]["issues"],
+    }
+    return {}, {}, meta
+
+
+_STAGE_FUNCTIONS = {
+    "upload": _upload,
+    "detect": _detect,
+    "template": _template,
+    "field_map": _field_map,
+    "standardize": _standardize,
+    "validate": _validate,
+    "insights": _insights,
+}
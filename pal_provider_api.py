@@ -0,0 +1,340 @@
+"""Local stand-in for provider PAL APIs and a concurrent ingestion client.
+
+The stand-in server exposes the three provider APIs offered in the demo,
+seeded from sample_data: two paginated REST endpoints and a GraphQL-style
+endpoint. The client fetches the first page, then fetches the remaining
+pages concurrently over a pool of keep-alive connections and lands the
+results in the same normalized schema as the file path.
+
+Run `python pal_provider_api.py --scale 2000` to measure API throughput.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import http.client
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from pal_lineage import describe_transformation, lineage_records
+from pal_sources import FUND_FIELDS, PLAN_FIELDS, load_sample_data, normalize_funds, normalize_plans
+
+PROVIDER_APIS = {
+    "Fidelity API v2.1": {"provider": "Fidelity", "style": "rest", "prefix": "/fidelity/v2.1"},
+    "Vanguard REST API v3.4": {"provider": "Vanguard", "style": "rest", "prefix": "/vanguard/v3.4"},
+    "T. Rowe Price GraphQL v1.8": {"provider": "T. Rowe Price", "style": "graphql", "prefix": "/trp/v1.8/graphql"},
+}
+
+# API field name -> standard field name
+API_FIELDS = {
+    "contractNumber": "Contract_Number",
+    "planName": "Plan_Name",
+    "clientName": "Client_Name",
+    "assetValue": "Asset_Value",
+    "participantCount": "Participant_Count",
+    "asOfDate": "As_Of_Date",
+    "fundName": "Fund_Name",
+    "ticker": "Ticker",
+    "fundValue": "Fund_Value",
+}
+_STANDARD_TO_API = {standard: api for api, standard in API_FIELDS.items()}
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(f"offset:{offset}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0
+    return int(base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)[1])
+
+
+def _to_api_records(frame):
+    """Normalized frame -> JSON-ready records with API field names"""
+    renamed = frame.rename(columns=_STANDARD_TO_API)
+    out = renamed[[col for col in API_FIELDS if col in renamed.columns]]
+    out = out.astype("object").where(out.notna(), None)
+    if "asOfDate" in out.columns:
+        out["asOfDate"] = out["asOfDate"].map(lambda d: d.isoformat() if d is not None else None)
+    # Money travels as decimal dollar strings, as provider APIs send it
+    for col in ("assetValue", "fundValue"):
+        if col in out.columns:
+            out[col] = out[col].map(_dollars)
+    return out.to_dict("records")
+
+
+def _dollars(cents):
+    """Cents -> '-1.50' style decimal string (None passes through)"""
+    if cents is None:
+        return None
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+def build_seed_data(data_dir="sample_data", scale=1):
+    """Per-provider {'plans': [...], 'funds': [...]} records, replicated `scale` times"""
+    plans, funds = load_sample_data(data_dir)
+    seeds = {}
+    for provider in plans["Provider"].unique():
+        provider_plans = plans[plans["Provider"] == provider]
+        provider_funds = funds[funds["Provider"] == provider]
+        if scale > 1:
+            copies_p, copies_f = [], []
+            for i in range(scale):
+                suffix = f"-{i:05d}"
+                p = provider_plans.copy()
+                f = provider_funds.copy()
+                p["Contract_Number"] = p["Contract_Number"] + suffix
+                f["Contract_Number"] = f["Contract_Number"] + suffix
+                copies_p.append(p)
+                copies_f.append(f)
+            provider_plans = pd.concat(copies_p, ignore_index=True)
+            provider_funds = pd.concat(copies_f, ignore_index=True)
+        seeds[provider] = {"plans": _to_api_records(provider_plans), "funds": _to_api_records(provider_funds)}
+    return seeds
+
+
+class _ProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive so the client can pool connections
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _page(self, provider, resource, cursor, limit):
+        records = self.server.seeds.get(provider, {}).get(resource)
+        if records is None:
+            return None
+        offset = decode_cursor(cursor)
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        end = min(offset + limit, len(records))
+        return records[offset:end], (encode_cursor(end) if end < len(records) else None), len(records)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        for api in PROVIDER_APIS.values():
+            if api["style"] == "rest" and url.path.startswith(api["prefix"] + "/"):
+                resource = url.path[len(api["prefix"]) + 1:]
+                params = parse_qs(url.query)
+                page = self._page(api["provider"], resource, params.get("cursor", [""])[0], params.get("limit", [100])[0])
+                if page is not None:
+                    data, next_cursor, total = page
+                    return self._send_json(200, {"data": data, "next_cursor": next_cursor, "total": total})
+        self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        for api in PROVIDER_APIS.values():
+            if api["style"] == "graphql" and url.path == api["prefix"]:
+                # Stand-in resolver: the query names the resource, variables page it
+                variables = request.get("variables", {})
+                resource = variables.get("resource", "plans")
+                page = self._page(api["provider"], resource, variables.get("cursor"), variables.get("first", 100))
+                if page is None:
+                    return self._send_json(200, {"errors": [{"message": f"Unknown resource {resource}"}]})
+                data, next_cursor, total = page
+                return self._send_json(200, {"data": {resource: {
+                    "nodes": data,
+                    "totalCount": total,
+                    "pageInfo": {"endCursor": next_cursor, "hasNextPage": next_cursor is not None},
+                }}})
+        self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+
+
+def start_server(seeds=None, host="127.0.0.1", port=0):
+    """Start the stand-in server on a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), _ProviderHandler)
+    server.daemon_threads = True
+    server.seeds = seeds if seeds is not None else build_seed_data()
+    thread = threading.Thread(target=server.serve_forever, name="pal-provider-api", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+class ConnectionPool:
+    """Bounded pool of keep-alive HTTP connections to one host"""
+
+    def __init__(self, base_url, size=8, timeout=30):
+        url = urlparse(base_url)
+        self.host, self.port, self.timeout = url.hostname, url.port, timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def request(self, method, path, body=None):
+        """Send one request and return the decoded JSON body"""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                headers = {"Content-Type": "application/json"} if body is not None else {}
+                conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+                response = conn.getresponse()
+                payload = json.loads(response.read())
+                if response.status != 200:
+                    raise RuntimeError(f"{method} {path} -> HTTP {response.status}: {payload}")
+            except Exception:
+                conn.close()
+                raise
+            self._idle.put(conn)
+            return payload
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _fetch_page(pool, api, resource, cursor, page_size):
+    """(records, next_cursor, total) for one page"""
+    if api["style"] == "graphql":
+        query = f"query Page($cursor: String, $first: Int) {{ {resource}(after: $cursor, first: $first) {{ nodes totalCount pageInfo {{ endCursor hasNextPage }} }} }}"
+        payload = pool.request("POST", api["prefix"], {
+            "query": query,
+            "variables": {"resource": resource, "cursor": cursor, "first": page_size},
+        })
+        if payload.get("errors"):
+            raise RuntimeError(payload["errors"][0]["message"])
+        page = payload["data"][resource]
+        return page["nodes"], page["pageInfo"]["endCursor"], page["totalCount"]
+
+    path = f"{api['prefix']}/{resource}?limit={page_size}"
+    if cursor:
+        path += f"&cursor={cursor}"
+    payload = pool.request("GET", path)
+    return payload["data"], payload["next_cursor"], payload["total"]
+
+
+async def ingest_resource(pool, api, resource, page_size=500, concurrency=8, start_cursor=None, retries=2):
+    """Fetch every page of a resource from start_cursor.
+
+    Returns (records, resume_cursor): resume_cursor is None only when every
+    row up to the server's total was fetched, otherwise the cursor of the
+    first row still missing.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(cursor):
+        async with semaphore:
+            for attempt in range(retries + 1):
+                try:
+                    return await asyncio.to_thread(_fetch_page, pool, api, resource, cursor, page_size)
+                except Exception:
+                    if attempt == retries:
+                        raise
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+
+    start_offset = decode_cursor(start_cursor)
+    first_records, next_cursor, total = await fetch(start_cursor)
+    records = list(first_records)
+    if next_cursor is not None and first_records:
+        # Remaining page cursors are known from the total, so fetch them concurrently. Step by
+        # the rows the server actually returned, since it may cap page_size.
+        step = len(first_records)
+        cursors = [encode_cursor(offset) for offset in range(decode_cursor(next_cursor), total, step)]
+        results = await asyncio.gather(*(fetch(cursor) for cursor in cursors), return_exceptions=True)
+        for cursor, result in zip(cursors, results):
+            if isinstance(result, BaseException):
+                return records, cursor  # resume from the first gap
+            records.extend(result[0])
+            if len(result[0]) < step and result[1] is not None:
+                return records, result[1]  # short page: the planned cursors no longer line up
+
+    fetched_to = start_offset + len(records)
+    if fetched_to < total:
+        return records, encode_cursor(fetched_to)
+    return records, None
+
+
+def _normalize(records, resource, provider):
+    frame = pd.DataFrame(records).rename(columns=API_FIELDS)
+    if resource == "plans":
+        frame = frame.reindex(columns=["Contract_Number", "Plan_Name", "Client_Name", "Asset_Value", "Participant_Count", "As_Of_Date"])
+        return normalize_plans(frame, provider)
+    frame = frame.reindex(columns=["Contract_Number", "Fund_Name", "Ticker", "Fund_Value", "As_Of_Date"])
+    return normalize_funds(frame, provider)
+
+
+def api_lineage(plans, funds, api_name):
+    """Lineage records for plans and funds synced from one provider API, traced to the resource they came from"""
+    api = PROVIDER_APIS[api_name]
+    frames = []
+    for label, frame, fields in (("plans", plans, PLAN_FIELDS), ("funds", funds, FUND_FIELDS)):
+        source = f"{api['prefix']} ({label})" if api["style"] == "graphql" else f"{api['prefix']}/{label}"
+        content_hash = hashlib.sha256(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes()).hexdigest()
+        frames.append(lineage_records(frame, label, source_file=source, source_hash=content_hash, template=api_name,
+                                      mapping_version=0, transformation=describe_transformation(fields)))
+    return pd.concat(frames, ignore_index=True)
+
+
+async def ingest_provider_async(base_url, api_name, page_size=500, concurrency=8, resume=None):
+    """Ingest plans and funds from one provider API into normalized frames"""
+    api = PROVIDER_APIS[api_name]
+    resume = resume or {}
+    pool = ConnectionPool(base_url, size=concurrency)
+    started = time.perf_counter()
+    try:
+        (plan_records, plan_resume), (fund_records, fund_resume) = await asyncio.gather(
+            ingest_resource(pool, api, "plans", page_size, concurrency, resume.get("plans")),
+            ingest_resource(pool, api, "funds", page_size, concurrency, resume.get("funds")),
+        )
+    finally:
+        pool.close()
+    elapsed = time.perf_counter() - started
+    rows = len(plan_records) + len(fund_records)
+    return {
+        "plans": _normalize(plan_records, "plans", api["provider"]),
+        "funds": _normalize(fund_records, "funds", api["provider"]),
+        "resume": {k: v for k, v in (("plans", plan_resume), ("funds", fund_resume)) if v},
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+    }
+
+
+def ingest_provider(base_url, api_name, **kwargs):
+    """Blocking wrapper for worker threads without an event loop"""
+    return asyncio.run(ingest_provider_async(base_url, api_name, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API ingestion throughput against the stand-in server")
+    parser.add_argument("--scale", type=int, default=1000, help="Replicate sample records this many times")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server, base_url = start_server(build_seed_data(scale=args.scale))
+    try:
+        for api_name in PROVIDER_APIS:
+            result = ingest_provider(base_url, api_name, page_size=args.page_size, concurrency=args.concurrency)
+            print(f"{api_name}: {result['rows']:,} rows in {result['seconds']:.2f}s ({result['rows_per_second']:,.0f} rows/s)"
+                  + (f", incomplete: {', '.join(result['resume'])}" if result["resume"] else ""))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
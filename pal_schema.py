@@ -0,0 +1,107 @@
+"""Typed, memory-compact schemas for plan and fund frames.
+
+Repeated strings become categoricals, unique strings use Arrow-backed
+storage, provider issues are bit-packed into an integer mask, numerics are
+downcast and money is held as nullable Int64 cents (unparseable amounts
+stay <NA>).
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from pal_money import parse_currency
+
+# Bit position of each provider issue in the `issue_flags` mask
+ISSUE_FLAGS = [
+    "Missing Contract Numbers",
+    "Inconsistent Date Formats",
+    "Extra Header Rows",
+    "Merged Cells",
+    "Special Characters",
+    "Encoding Issues",
+    "Fund Name Variations",
+    "Decimal Precision",
+    "Multiple Worksheets",
+    "Formula References",
+    "No Delimiters",
+    "Padding Spaces",
+    "Nested Objects",
+    "Missing Fields",
+    "Namespace Issues",
+    "Invalid Characters",
+]
+_ISSUE_BITS = {name: np.uint16(1 << i) for i, name in enumerate(ISSUE_FLAGS)}
+
+STRING = pd.StringDtype("pyarrow")
+DATE = pd.ArrowDtype(pa.date32())
+
+PLAN_SCHEMA = {
+    "provider": "category",
+    "template_type": "category",
+    "contract_number": STRING,
+    "plan_name": "category",
+    "client_name": STRING,
+    "assets_cents": "Int64",
+    "participants": "int32",
+    "last_updated": DATE,
+    "data_quality_score": "int8",
+    "issue_flags": "uint16",
+    "processing_time_hours": "float32",
+}
+
+FUND_SCHEMA = {
+    "pal_fund_name": "category",
+    "master_fund_name": "category",
+    "ticker": STRING,
+    "match_confidence": "float32",
+    "requires_review": "bool",
+    "asset_value_cents": "Int64",
+}
+
+
+def encode_issues(issues):
+    """Bit-pack a sequence of issue lists into a uint16 mask array"""
+    masks = np.zeros(len(issues), dtype=np.uint16)
+    for row, row_issues in enumerate(issues):
+        for issue in row_issues:
+            masks[row] |= _ISSUE_BITS[issue]
+    return masks
+
+
+def _apply_schema(df, schema):
+    ordered = [col for col in schema if col in df.columns]
+    extra = [col for col in df.columns if col not in schema]
+    return df[ordered + extra].astype({col: schema[col] for col in ordered})
+
+
+def compact_plan_frame(df):
+    """Convert a raw plan frame to PLAN_SCHEMA"""
+    df = df.copy()
+    if "issues" in df.columns:
+        df["issue_flags"] = encode_issues(df.pop("issues"))
+    if "assets" in df.columns:
+        df["assets_cents"] = parse_currency(df.pop("assets"))
+    if "last_updated" in df.columns:
+        df["last_updated"] = pd.to_datetime(df["last_updated"]).dt.date
+    return _apply_schema(df, PLAN_SCHEMA)
+
+
+def compact_fund_frame(df):
+    """Convert a raw fund frame to FUND_SCHEMA"""
+    df = df.copy()
+    if "asset_value" in df.columns:
+        df["asset_value_cents"] = parse_currency(df.pop("asset_value"))
+    return _apply_schema(df, FUND_SCHEMA)
+
+
+_ARROW_TYPES = {
+    pa.string(): STRING,
+    pa.large_string(): STRING,
+    pa.date32(): DATE,
+}
+
+
+def table_to_frame(table):
+    """Arrow table to pandas, keeping compact string and date dtypes"""
+    return table.to_pandas(types_mapper=_ARROW_TYPES.get)
@@ -0,0 +1,477 @@
+"""Sharded quarter-end processing over a file-based work queue.
+
+A coordinator splits a quarter's provider files into shards keyed on
+provider and file format. Large CSVs are cut into record-aligned byte
+ranges, and small files are bundled up to a target size. Each shard is a
+JSON spec in the queue's pending/ directory. Workers claim a shard by
+renaming it into leased/; the rename is atomic, so exactly one worker wins.
+A worker can be a process on this host or on any host that mounts the
+queue directory. It runs the shard's files through the pipeline stages,
+writes the results under results/<shard id>, and commits by renaming the
+lease into done/. While
+it works, a heartbeat keeps touching the lease, so only a worker that has
+died lets its lease expire.
+
+Input files must be reachable from every worker. With PAL_SHARED_ROOT set,
+shard specs store paths relative to it and each host resolves them against
+its own mount of the share; otherwise they hold absolute paths, which must
+be the same on every host.
+
+Shard ids are hashes of the shard's inputs. Enqueueing the same quarter
+twice is therefore a no-op, and a shard re-run after a crash or an expired
+lease rewrites identical results.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+from pal_cache import quarter_of
+from pal_csv import csv_ranges
+from pal_lineage import LineageLog
+from pal_pipeline import STAGES, PipelineRun, unit_name
+from pal_rollups import standard_rollup_frame, update_rollups
+from pal_schema import table_to_frame
+from pal_sources import SAMPLE_DATA_DIR, SAMPLE_FILES, TEMPLATE_TYPES, detect_format
+from pal_sync import DEFAULT_DB_PATH, sync_to_master
+from pal_templates import TemplateRegistry
+
+DEFAULT_QUEUE_DIR = os.path.join(os.environ.get("PAL_DATA_DIR", ".pal_data"), "queue")
+TARGET_SHARD_BYTES = 64 * 1024 * 1024
+LEASE_SECONDS = 600
+HEARTBEAT_SECONDS = LEASE_SECONDS / 4
+# Root of the shared file store as mounted on this host
+SHARED_ROOT = os.environ.get("PAL_SHARED_ROOT")
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+STATES = (PENDING, LEASED, DONE, FAILED)
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class WorkQueue:
+    """Directory-backed shard queue; a shard's state is the directory holding its spec"""
+
+    def __init__(self, queue_dir):
+        self.queue_dir = queue_dir
+        for state in STATES + ("results",):
+            os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+
+    def _path(self, state, shard_id):
+        return os.path.join(self.queue_dir, state, f"{shard_id}.json")
+
+    def state_of(self, shard_id):
+        for state in STATES:
+            if os.path.exists(self._path(state, shard_id)):
+                return state
+        return None
+
+    def shards(self):
+        """(state, spec) for every shard in the queue"""
+        found = []
+        for state in STATES:
+            directory = os.path.join(self.queue_dir, state)
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(directory, name)) as f:
+                        found.append((state, json.load(f)))
+                except FileNotFoundError:
+                    continue  # moved to another state while listing
+        return found
+
+    def enqueue(self, shard):
+        """Add a shard spec; False if that shard is already queued or finished"""
+        if self.state_of(shard["shard_id"]) is not None:
+            return False
+        _write_json(self._path(PENDING, shard["shard_id"]), shard)
+        return True
+
+    def claim(self, worker_id):
+        """Lease the next pending shard, or None when there is none"""
+        for name in sorted(os.listdir(os.path.join(self.queue_dir, PENDING))):
+            if not name.endswith(".json"):
+                continue
+            pending = os.path.join(self.queue_dir, PENDING, name)
+            leased = os.path.join(self.queue_dir, LEASED, name)
+            try:
+                # mtime is the lease start; set before the rename so requeue never sees a stale lease
+                os.utime(pending)
+                os.rename(pending, leased)
+                with open(leased) as f:
+                    shard = json.load(f)
+            except FileNotFoundError:
+                continue  # another worker got there first
+            shard["worker"] = worker_id
+            _write_json(leased, shard)
+            return shard
+        return None
+
+    def renew(self, shard_id):
+        """Restart a lease's clock; False if the lease is no longer held"""
+        try:
+            os.utime(self._path(LEASED, shard_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def complete(self, shard_id):
+        """Commit a leased shard whose results are written; False if the lease was lost"""
+        try:
+            os.replace(self._path(LEASED, shard_id), self._path(DONE, shard_id))
+        except FileNotFoundError:
+            return False  # requeued and claimed elsewhere; that worker writes the same results
+        return True
+
+    def fail(self, shard, error):
+        """Move a shard this worker still leases to failed/; False if the lease was lost"""
+        leased = self._path(LEASED, shard["shard_id"])
+        try:
+            with open(leased) as f:
+                owner = json.load(f).get("worker")
+        except FileNotFoundError:
+            return False
+        if owner != shard["worker"]:
+            return False  # requeued and claimed elsewhere; that worker decides the shard's fate
+        _write_json(leased, dict(shard, error=error))
+        try:
+            os.replace(leased, self._path(FAILED, shard["shard_id"]))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def requeue(self, lease_seconds=LEASE_SECONDS, failed=False):
+        """Return expired leases (and optionally failed shards) to pending"""
+        moved = 0
+        cutoff = time.time() - lease_seconds
+        for state in (LEASED, FAILED) if failed else (LEASED,):
+            directory = os.path.join(self.queue_dir, state)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if not name.endswith(".json") or (state == LEASED and os.path.getmtime(path) > cutoff):
+                    continue
+                try:
+                    os.rename(path, os.path.join(self.queue_dir, PENDING, name))
+                    moved += 1
+                except FileNotFoundError:
+                    pass
+        return moved
+
+    def counts(self):
+        return {
+            state: sum(name.endswith(".json") for name in os.listdir(os.path.join(self.queue_dir, state)))
+            for state in STATES
+        }
+
+    def results_path(self, shard_id, label):
+        return os.path.join(self.queue_dir, "results", f"{shard_id}.{label}.arrow")
+
+
+def queue_for(quarter, queue_root=DEFAULT_QUEUE_DIR):
+    """The work queue for one quarter's run"""
+    return WorkQueue(os.path.join(queue_root, quarter))
+
+
+def _shared_path(path):
+    """Path as stored in a shard spec: relative to SHARED_ROOT when under it, else absolute"""
+    path = os.path.abspath(path)
+    if SHARED_ROOT:
+        relative = os.path.relpath(path, SHARED_ROOT)
+        if not relative.startswith(os.pardir):
+            return relative
+    return path
+
+
+def _local_path(path):
+    """A shard spec path resolved on this host"""
+    return os.path.join(SHARED_ROOT, path) if SHARED_ROOT and not os.path.isabs(path) else path
+
+
+def _part(path, begin=None, end=None):
+    stat = os.stat(path)
+    return {"path": _shared_path(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "begin": begin, "end": end}
+
+
+def _shard(quarter, provider, file_format, parts):
+    identity = json.dumps([quarter, provider, file_format, parts], sort_keys=True)
+    return {
+        "shard_id": hashlib.sha256(identity.encode()).hexdigest()[:24],
+        "quarter": quarter,
+        "provider": provider,
+        "format": file_format,
+        "parts": parts,
+        "bytes": sum((part["end"] - part["begin"]) if part["begin"] is not None else part["size"] for part in parts),
+    }
+
+
+def plan_shards(files, quarter, target_bytes=TARGET_SHARD_BYTES):
+    """Shard specs for {path: provider} files, by provider, format and size"""
+    groups = {}
+    for path, provider in files.items():
+        groups.setdefault((provider, detect_format(path)), []).append(path)
+
+    shards = []
+    for (provider, file_format), paths in sorted(groups.items()):
+        bundle, bundle_bytes = [], 0
+        for path in sorted(paths):
+            size = os.path.getsize(path)
+            if file_format == "csv" and size > target_bytes:
+                for begin, end in csv_ranges(path, target_bytes):
+                    shards.append(_shard(quarter, provider, file_format, [_part(path, begin, end)]))
+                continue
+            if bundle and bundle_bytes + size > target_bytes:
+                shards.append(_shard(quarter, provider, file_format, bundle))
+                bundle, bundle_bytes = [], 0
+            bundle.append(_part(path))
+            bundle_bytes += size
+        if bundle:
+            shards.append(_shard(quarter, provider, file_format, bundle))
+    return shards
+
+
+def coordinate(files, quarter, queue_root=DEFAULT_QUEUE_DIR, target_bytes=TARGET_SHARD_BYTES):
+    """Split a quarter's files into shards and enqueue the ones not seen before"""
+    work_queue = queue_for(quarter, queue_root)
+    shards = plan_shards(files, quarter, target_bytes)
+    enqueued = sum(work_queue.enqueue(shard) for shard in shards)
+    return {"shards": [shard["shard_id"] for shard in shards], "enqueued": enqueued,
+            "bytes": sum(shard["bytes"] for shard in shards)}
+
+
+def _write_result(path, frame):
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def process_shard(work_queue, shard, registry=None, lineage=None):
+    """Run a shard's parts through the pipeline stages, writing plans and funds results.
+
+    Each shard is one PipelineRun under the queue's runs/ directory, so
+    field mapping, registry date formats, validation and lineage match the
+    single-host pipeline, and a shard re-run after a lost lease resumes
+    from its checkpoints. Lineage is flushed by the standardize stage, so a
+    shard is never committed without it.
+    """
+    files, ranges = {}, {}
+    for part in shard["parts"]:
+        path = _local_path(part["path"])
+        stat = os.stat(path)
+        if (stat.st_size, stat.st_mtime_ns) != (part["size"], part["mtime_ns"]):
+            raise RuntimeError(f"{part['path']} changed after the quarter was sharded")
+        files[path] = shard["provider"]
+        if part["begin"] is not None:
+            ranges[path] = (part["begin"], part["end"])
+    run = PipelineRun(files, shard["shard_id"], registry, runs_dir=os.path.join(work_queue.queue_dir, "runs"),
+                      lineage=lineage, ranges=ranges)
+    for stage in STAGES:
+        failed = run.run_stage(stage)["failed"]
+        if failed:
+            raise RuntimeError("; ".join(f"{os.path.basename(path)}: {error}" for path, error in failed.items()))
+    results = {
+        label: pd.concat([run.read_output("standardize", unit_name(path), label) for path in files], ignore_index=True)
+        for label in ("plans", "funds")
+    }
+    for label, frame in results.items():
+        _write_result(work_queue.results_path(shard["shard_id"], label), frame)
+    return sum(len(frame) for frame in results.values())
+
+
+@contextmanager
+def _heartbeat(work_queue, shard_id, interval=HEARTBEAT_SECONDS):
+    """Renew a shard's lease in the background until the block exits"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval) and work_queue.renew(shard_id):
+            pass
+
+    thread = threading.Thread(target=beat, name=f"pal-lease-{shard_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_worker(quarter, queue_root=DEFAULT_QUEUE_DIR, wait_seconds=0.0, poll_seconds=1.0):
+    """Claim and process shards until the queue stays empty for wait_seconds.
+
+    Templates and lineage go to the default TemplateRegistry and
+    LineageLog, so PAL_DATA_DIR must be shared for workers on other hosts
+    to use the app's learned mappings and record lineage where it looks.
+
+    Returns (shards processed, rows written).
+    """
+    work_queue = queue_for(quarter, queue_root)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    registry = TemplateRegistry()
+    lineage = LineageLog()
+    processed = rows = 0
+    idle_since = time.monotonic()
+    while True:
+        shard = work_queue.claim(worker_id)
+        if shard is None:
+            if time.monotonic() - idle_since >= wait_seconds:
+                return processed, rows
+            time.sleep(poll_seconds)
+            continue
+        try:
+            with _heartbeat(work_queue, shard["shard_id"]):
+                shard_rows = process_shard(work_queue, shard, registry, lineage)
+            committed = work_queue.complete(shard["shard_id"])
+        except Exception as exc:
+            work_queue.fail(shard, f"{type(exc).__name__}: {exc}")
+        else:
+            processed += committed
+            rows += shard_rows if committed else 0
+        idle_since = time.monotonic()
+
+
+def run_workers(quarter, processes=None, queue_root=DEFAULT_QUEUE_DIR):
+    """Drain a quarter's queue with local worker processes; returns (shards, rows).
+
+    Each worker is a fresh `pal_shards.py worker` process, the same command a
+    remote host runs, so nothing from the calling process (e.g. a Streamlit
+    script) is re-imported or inherited.
+    """
+    processes = processes or os.cpu_count() or 1
+    command = [sys.executable, os.path.abspath(__file__), "--quarter", quarter, "--queue-dir", queue_root,
+               "worker", "--processes", "1"]
+    workers = [subprocess.Popen(command, stdout=subprocess.PIPE, text=True) for _ in range(processes)]
+    shards = rows = 0
+    for worker in workers:
+        output, _ = worker.communicate()
+        if worker.returncode != 0:
+            raise RuntimeError(f"Shard worker exited with status {worker.returncode}")
+        result = json.loads(output.strip().splitlines()[-1])
+        shards += result["shards"]
+        rows += result["rows"]
+    return shards, rows
+
+
+def _read_result(work_queue, shard_id, label):
+    with pa.memory_map(work_queue.results_path(shard_id, label), "r") as source:
+        return table_to_frame(pa.ipc.open_file(source).read_all())
+
+
+def collect_results(quarter, shard_ids=None, queue_root=DEFAULT_QUEUE_DIR):
+    """(plans, funds) across a quarter's committed shards"""
+    work_queue = queue_for(quarter, queue_root)
+    if shard_ids is None:
+        shard_ids = [name[:-5] for name in sorted(os.listdir(os.path.join(work_queue.queue_dir, DONE)))]
+    frames = {"plans": [], "funds": []}
+    for shard_id in shard_ids:
+        if work_queue.state_of(shard_id) != DONE:
+            continue
+        for label, parts in frames.items():
+            parts.append(_read_result(work_queue, shard_id, label))
+    if not frames["plans"]:
+        return pd.DataFrame(), pd.DataFrame()
+    # A plan repeated on several holding rows can land in more than one range shard
+    plans = pd.concat(frames["plans"], ignore_index=True)
+    plans = plans.drop_duplicates().reset_index(drop=True)
+    return plans, pd.concat(frames["funds"], ignore_index=True)
+
+
+def rollup_shards(quarter, queue_root=DEFAULT_QUEUE_DIR, db_path=DEFAULT_DB_PATH):
+    """Count every committed shard's plans in the quarter's rollups.
+
+    Rollups are keyed per plan, so a plan straddling two range shards, a
+    shard collected twice or a file also run through the pipeline is
+    counted once. Returns the number of plans newly counted.
+    """
+    work_queue = queue_for(quarter, queue_root)
+    counted = 0
+    for state, shard in work_queue.shards():
+        if state != DONE:
+            continue
+        plans = _read_result(work_queue, shard["shard_id"], "plans")
+        template_type = TEMPLATE_TYPES.get(shard["format"], shard["format"])
+        counted += update_rollups(standard_rollup_frame(plans, template_type), quarter=quarter, path=db_path)
+    return counted
+
+
+def _parse_files(specs):
+    if not specs:
+        return {os.path.join(SAMPLE_DATA_DIR, name): provider for name, provider in SAMPLE_FILES.items()}
+    files = {}
+    for spec in specs:
+        provider, sep, path = spec.partition("=")
+        if not sep:
+            raise SystemExit(f"Expected PROVIDER=PATH, got {spec!r}")
+        files[path] = provider
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded quarter-end processing over a file-based work queue")
+    parser.add_argument("--quarter", default=quarter_of(pd.Timestamp.now()))
+    parser.add_argument("--queue-dir", default=DEFAULT_QUEUE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinate_cmd = commands.add_parser("coordinate", help="Shard files onto the queue")
+    coordinate_cmd.add_argument("files", nargs="*", help="PROVIDER=PATH entries (default: sample_data)")
+    coordinate_cmd.add_argument("--target-mb", type=float, default=TARGET_SHARD_BYTES / 1024 / 1024)
+
+    worker_cmd = commands.add_parser("worker", help="Process shards until the queue is empty")
+    worker_cmd.add_argument("--processes", type=int, default=None)
+    worker_cmd.add_argument("--wait", type=float, default=0.0, help="Seconds to keep polling an empty queue")
+
+    requeue_cmd = commands.add_parser("requeue", help="Return expired leases to pending")
+    requeue_cmd.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+    requeue_cmd.add_argument("--failed", action="store_true", help="Also retry failed shards")
+
+    commands.add_parser("status", help="Shard counts by state")
+    commands.add_parser("collect", help="Upsert committed results into the master database and rollups")
+    args = parser.parse_args()
+
+    if args.command == "coordinate":
+        result = coordinate(_parse_files(args.files), args.quarter, args.queue_dir, int(args.target_mb * 1024 * 1024))
+        print(f"{len(result['shards'])} shards ({result['enqueued']} new), {result['bytes']:,} bytes")
+    elif args.command == "worker":
+        started = time.perf_counter()
+        if args.processes == 1 or args.wait:
+            shards, rows = run_worker(args.quarter, args.queue_dir, wait_seconds=args.wait)
+        else:
+            shards, rows = run_workers(args.quarter, args.processes, args.queue_dir)
+        print(json.dumps({"shards": shards, "rows": rows, "seconds": round(time.perf_counter() - started, 3)}))
+    elif args.command == "requeue":
+        print(f"{queue_for(args.quarter, args.queue_dir).requeue(args.lease_seconds, args.failed)} shards requeued")
+    elif args.command == "status":
+        print(json.dumps(queue_for(args.quarter, args.queue_dir).counts()))
+    elif args.command == "collect":
+        plans, funds = collect_results(args.quarter, queue_root=args.queue_dir)
+        stats = sync_to_master(plans=plans, funds=funds)
+        rolled_up = rollup_shards(args.quarter, args.queue_dir)
+        print(f"{stats['plans']:,} plans and {stats['funds']:,} holdings upserted in {stats['seconds']:.2f}s, "
+              f"{rolled_up} plans newly counted in rollups")
+
+
+if __name__ == "__main__":
+    main()
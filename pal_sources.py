@@ -0,0 +1,230 @@
+"""Readers for provider PAL files and normalization to standard fields.
+
+Each reader returns (plans, funds) frames using the standard field names
+(Contract_Number, Plan_Name, ...) with raw string values; normalize_plans
+and normalize_funds then apply the typed conversions.
+"""
+
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from pal_csv import csv_header, read_csv_parallel, record_offsets
+from pal_dates import normalize_dates
+from pal_money import parse_currency
+from pal_schema import table_to_frame
+
+SAMPLE_DATA_DIR = "sample_data"
+
+PLAN_FIELDS = ["Contract_Number", "Plan_Name", "Client_Name", "Asset_Value", "Participant_Count", "As_Of_Date"]
+FUND_FIELDS = ["Contract_Number", "Fund_Name", "Ticker", "Fund_Value", "As_Of_Date"]
+
+# Optional column with the byte offset in the source file each row came from
+SOURCE_OFFSET = "_source_offset"
+
+# Sample file -> provider that sends it
+SAMPLE_FILES = {
+    "fidelity_messy_pal.csv": "Fidelity",
+    "vanguard_pal.xlsx": "Vanguard",
+    "trp_pal.xml": "T. Rowe Price",
+}
+
+# Labels used by the Vanguard key/value export
+_VANGUARD_LABELS = {
+    "Contract Number": "Contract_Number",
+    "Plan Name": "Plan_Name",
+    "Client": "Client_Name",
+    "Total Assets": "Asset_Value",
+    "Participants": "Participant_Count",
+    "As of Date": "As_Of_Date",
+    "Fund Name": "Fund_Name",
+    "Fund Value": "Fund_Value",
+    "Ticker": "Ticker",
+}
+
+
+def _frames(plans, funds, offsets=False):
+    extra = [SOURCE_OFFSET] if offsets else []
+    plans = pd.DataFrame(plans).reindex(columns=PLAN_FIELDS + extra)
+    funds = pd.DataFrame(funds).reindex(columns=FUND_FIELDS + extra)
+    return plans, funds
+
+
+def split_flat_rows(raw):
+    """(plans, funds) from flat rows with one row per plan/fund holding"""
+    extra = [SOURCE_OFFSET] if SOURCE_OFFSET in raw.columns else []
+    plans = raw.reindex(columns=PLAN_FIELDS + extra).drop_duplicates(subset=PLAN_FIELDS)
+    funds = raw.reindex(columns=FUND_FIELDS + extra)
+    return plans.reset_index(drop=True), funds
+
+
+def read_flat_csv(path, offsets=False):
+    """Flat CSV with one row per plan/fund holding"""
+    raw = table_to_frame(read_csv_parallel(path))
+    if offsets:
+        raw[SOURCE_OFFSET] = record_offsets(path)
+    return split_flat_rows(raw)
+
+
+def read_key_value_export(path, offsets=False):
+    """'Label: value' export with plan details followed by fund holdings"""
+    plans, funds = [], []
+    plan, fund = {}, None
+    position = 0
+    with open(path, "rb") as f:
+        for raw_line in f:
+            line = raw_line.decode("utf-8-sig" if position == 0 else "utf-8")
+            line_start, position = position, position + len(raw_line)
+            label, sep, value = line.partition(":")
+            field = _VANGUARD_LABELS.get(label.strip())
+            if not sep or field is None:
+                continue
+            value = value.strip()
+            if field == "Contract_Number" and plan:
+                plans.append(plan)
+                plan, fund = {}, None
+            if field == "Fund_Name":
+                fund = {"Contract_Number": plan.get("Contract_Number"), "As_Of_Date": plan.get("As_Of_Date"),
+                        SOURCE_OFFSET: line_start}
+                funds.append(fund)
+            if fund is not None and field in ("Fund_Name", "Fund_Value", "Ticker"):
+                fund[field] = value
+            else:
+                plan.setdefault(SOURCE_OFFSET, line_start)
+                plan[field] = value
+    if plan:
+        plans.append(plan)
+    return _frames(plans, funds, offsets)
+
+
+def _element_offsets(path, tag):
+    """Byte offset of every <tag> start tag, in document order"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return [match.start() for match in re.finditer(rb"<" + tag.encode() + rb"[\s/>]", data)]
+
+
+def read_plan_xml(path, offsets=False):
+    """<PlanData> XML with a Plan element and its Funds"""
+    root = ET.parse(path).getroot()
+    plans, funds = [], []
+    plan_elements = root.findall("Plan")
+    fund_groups = root.findall("Funds")
+    for i, element in enumerate(plan_elements):
+        text = lambda tag: (element.findtext(tag) or "").strip()
+        plan = {
+            "Contract_Number": text("ContractNumber"),
+            "Plan_Name": text("PlanName"),
+            "Client_Name": text("ClientName"),
+            "Asset_Value": text("TotalAssets"),
+            "Participant_Count": text("ParticipantCount"),
+            "As_Of_Date": text("AsOfDate"),
+        }
+        plans.append(plan)
+        group = fund_groups[i] if i < len(fund_groups) else None
+        for fund in (group.findall("Fund") if group is not None else []):
+            funds.append({
+                "Contract_Number": plan["Contract_Number"],
+                "Fund_Name": (fund.findtext("Name") or "").strip(),
+                "Ticker": (fund.findtext("Ticker") or "").strip(),
+                "Fund_Value": (fund.findtext("Value") or "").strip(),
+                "As_Of_Date": plan["As_Of_Date"],
+            })
+    if offsets:
+        for rows, tag in ((plans, "Plan"), (funds, "Fund")):
+            starts = _element_offsets(path, tag)
+            for row, start in zip(rows, starts if len(starts) == len(rows) else []):
+                row[SOURCE_OFFSET] = start
+    return _frames(plans, funds, offsets)
+
+
+# detect_format result -> template type label used in rollups
+TEMPLATE_TYPES = {"xml": "XML", "csv": "CSV", "key_value": "Key-Value Export"}
+
+
+def detect_format(path):
+    """'xml', 'csv' or 'key_value', from the file's content and extension"""
+    with open(path, "rb") as f:
+        head = f.read(256).lstrip()
+    if head.startswith(b"<"):
+        return "xml"
+    if path.lower().endswith(".csv"):
+        return "csv"
+    return "key_value"
+
+
+_READERS = {
+    "xml": read_plan_xml,
+    "csv": read_flat_csv,
+    "key_value": read_key_value_export,
+}
+
+
+def read_provider_file(path, offsets=False):
+    """Dispatch on file content/extension to the matching reader.
+
+    With offsets, both frames carry a SOURCE_OFFSET column holding the byte
+    offset of the record each row was read from.
+    """
+    return _READERS[detect_format(path)](path, offsets)
+
+
+def source_columns(path, file_format=None):
+    """Field names as the provider wrote them (CSV header, XML tags or export labels), in file order"""
+    file_format = file_format or detect_format(path)
+    if file_format == "csv":
+        return csv_header(path)
+    if file_format == "xml":
+        root = ET.parse(path).getroot()
+        elements = [root.find("Plan"), root.find("Funds/Fund")]
+        return [child.tag for element in elements if element is not None for child in element]
+    labels = {}
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            label, sep, _ = line.partition(":")
+            if sep and label.strip():
+                labels.setdefault(label.strip(), None)
+    return list(labels)
+
+
+def _blank_to_na(series):
+    # Arrow-backed columns from the CSV reader keep their storage
+    text = (series if isinstance(series.dtype, pd.StringDtype) else series.astype("string")).str.strip()
+    return text.mask(text == "")
+
+
+def normalize_plans(plans, provider, registry=None, template=None):
+    """Typed plan frame: cents, integer counts, dates, provider column"""
+    out = plans.copy()
+    out["Contract_Number"] = _blank_to_na(out["Contract_Number"])
+    out["Plan_Name"] = _blank_to_na(out["Plan_Name"])
+    out["Client_Name"] = _blank_to_na(out["Client_Name"])
+    out["Asset_Value"] = parse_currency(out["Asset_Value"])
+    counts = out["Participant_Count"].astype("string").str.replace(",", "", regex=False)
+    out["Participant_Count"] = pd.to_numeric(counts, errors="coerce").astype("Int32")
+    out["As_Of_Date"] = normalize_dates(out["As_Of_Date"], registry, template, "As_Of_Date")
+    out["Provider"] = provider
+    return out
+
+
+def normalize_funds(funds, provider, registry=None, template=None):
+    """Typed fund holding frame: cents, dates, provider column"""
+    out = funds.copy()
+    for col in ("Contract_Number", "Fund_Name", "Ticker"):
+        out[col] = _blank_to_na(out[col])
+    out["Fund_Value"] = parse_currency(out["Fund_Value"])
+    out["As_Of_Date"] = normalize_dates(out["As_Of_Date"], registry, template, "As_Of_Date")
+    out["Provider"] = provider
+    return out
+
+
+def load_sample_data(data_dir=SAMPLE_DATA_DIR):
+    """Normalized (plans, funds) across every sample provider file"""
+    all_plans, all_funds = [], []
+    for file_name, provider in SAMPLE_FILES.items():
+        plans, funds = read_provider_file(os.path.join(data_dir, file_name))
+        all_plans.append(normalize_plans(plans, provider))
+        all_funds.append(normalize_funds(funds, provider))
+    return pd.concat(all_plans, ignore_index=True), pd.concat(all_funds, ignore_index=True)
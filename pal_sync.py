@@ -0,0 +1,183 @@
+"""Bulk sync of normalized plans and fund holdings into the master database.
+
+The master database is an embedded SQLite file in WAL mode. Loads run as
+batched upserts: one prepared INSERT ... ON CONFLICT statement executed
+with executemany, one transaction per batch.
+"""
+
+import os
+import sqlite3
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+DEFAULT_DB_PATH = os.path.join(os.environ.get("PAL_DATA_DIR", ".pal_data"), "master.db")
+BATCH_SIZE = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    contract_number   TEXT PRIMARY KEY,
+    plan_name         TEXT,
+    client_name       TEXT,
+    provider          TEXT,
+    asset_value_cents INTEGER,
+    participant_count INTEGER,
+    as_of_date        TEXT,
+    synced_at         REAL
+);
+CREATE TABLE IF NOT EXISTS plan_funds (
+    contract_number  TEXT NOT NULL,
+    ticker           TEXT NOT NULL,
+    fund_name        TEXT,
+    provider         TEXT,
+    fund_value_cents INTEGER,
+    as_of_date       TEXT,
+    synced_at        REAL,
+    PRIMARY KEY (contract_number, ticker)
+);
+"""
+
+# Standard field name -> plans column
+PLAN_COLUMNS = {
+    "Contract_Number": "contract_number",
+    "Plan_Name": "plan_name",
+    "Client_Name": "client_name",
+    "Provider": "provider",
+    "Asset_Value": "asset_value_cents",
+    "Participant_Count": "participant_count",
+    "As_Of_Date": "as_of_date",
+}
+
+# Standard field name -> plan_funds column
+FUND_COLUMNS = {
+    "Contract_Number": "contract_number",
+    "Ticker": "ticker",
+    "Fund_Name": "fund_name",
+    "Provider": "provider",
+    "Fund_Value": "fund_value_cents",
+    "As_Of_Date": "as_of_date",
+}
+
+
+def connect(path=DEFAULT_DB_PATH):
+    """Open the master database with bulk-load friendly pragmas"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _upsert_sql(table, columns, keys):
+    names = ", ".join(columns + ["synced_at"])
+    placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+    updates = ", ".join(f"{col}=excluded.{col}" for col in columns + ["synced_at"] if col not in keys)
+    return (
+        f"INSERT INTO {table} ({names}) VALUES ({placeholders}) "
+        f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}"
+    )
+
+
+def _records(df, column_map):
+    """Frame with standard field names -> DB column frame of plain Python values"""
+    present = {src: dst for src, dst in column_map.items() if src in df.columns}
+    out = df[list(present)].rename(columns=present)
+    for col in column_map.values():
+        if col not in out.columns:
+            out[col] = None
+    out = out[list(column_map.values())]
+    if "as_of_date" in out.columns:
+        out["as_of_date"] = _iso_dates(out["as_of_date"])
+    return out
+
+
+def _iso_dates(dates):
+    """'YYYY-MM-DD' strings for a date column; typed dates go through one Arrow cast"""
+    if isinstance(dates.dtype, pd.ArrowDtype) and pa.types.is_date(dates.dtype.pyarrow_dtype):
+        # Arrow renders dates as ISO strings, far cheaper than a strftime per value
+        iso = pa.array(dates).cast(pa.string())
+        return pd.Series(iso, index=dates.index, dtype=pd.ArrowDtype(pa.string()))
+    if pd.api.types.is_datetime64_any_dtype(dates.dtype):
+        return dates.dt.strftime("%Y-%m-%d")
+    # Text dates: standardized ones are ISO already; only reformat the ones that are not
+    dates = dates.astype("string")
+    other = dates.notna() & ~dates.str.fullmatch(r"\d{4}-\d{2}-\d{2}").fillna(False)
+    if other.any():
+        reparsed = pd.to_datetime(dates[other], errors="coerce", format="mixed")
+        dates[other] = reparsed.dt.strftime("%Y-%m-%d")
+    return dates
+
+
+def _bulk_upsert(conn, table, records, keys, batch_size):
+    columns = list(records.columns)
+    sql = _upsert_sql(table, columns, keys)
+    key_mask = records[keys].notna().all(axis=1)
+    for key in keys:
+        # Arrow-backed strings strip in one kernel instead of a Python call per value
+        key_mask &= (records[key].astype(pd.StringDtype("pyarrow")).str.strip() != "").fillna(False)
+    rows = records[key_mask]
+    synced_at = time.time()
+
+    # Column-wise tolist() yields plain int/str/None, which sqlite3 binds directly
+    values = [rows[col].astype("object").where(rows[col].notna(), None).tolist() for col in columns]
+    values.append([synced_at] * len(rows))
+    params = list(zip(*values))
+
+    written = 0
+    for start in range(0, len(params), batch_size):
+        batch = params[start:start + batch_size]
+        with conn:
+            conn.executemany(sql, batch)
+        written += len(batch)
+    return written, int((~key_mask).sum())
+
+
+def sync_to_master(plans=None, funds=None, path=DEFAULT_DB_PATH, batch_size=BATCH_SIZE):
+    """Upsert normalized plans (by contract) and fund holdings (by contract, ticker).
+
+    Rows missing their key are skipped and counted. Returns a stats dict.
+    """
+    stats = {"plans": 0, "plans_skipped": 0, "funds": 0, "funds_skipped": 0}
+    started = time.perf_counter()
+    conn = connect(path)
+    try:
+        if plans is not None and len(plans):
+            stats["plans"], stats["plans_skipped"] = _bulk_upsert(
+                conn, "plans", _records(plans, PLAN_COLUMNS), ["contract_number"], batch_size
+            )
+        if funds is not None and len(funds):
+            stats["funds"], stats["funds_skipped"] = _bulk_upsert(
+                conn, "plan_funds", _records(funds, FUND_COLUMNS), ["contract_number", "ticker"], batch_size
+            )
+    finally:
+        conn.close()
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_second"] = (stats["plans"] + stats["funds"]) / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def master_state(path=DEFAULT_DB_PATH):
+    """Token that changes whenever a sync writes plans or holdings"""
+    conn = connect(path)
+    try:
+        rows = [conn.execute(f"SELECT COUNT(*), MAX(synced_at) FROM {table}").fetchone() for table in ("plans", "plan_funds")]
+    finally:
+        conn.close()
+    return ":".join(f"{count}@{synced_at}" for count, synced_at in rows)
+
+
+def read_table(table, path=DEFAULT_DB_PATH):
+    """Whole master table as a frame (plans or plan_funds)"""
+    if table not in ("plans", "plan_funds"):
+        raise ValueError(f"Unknown master table: {table}")
+    conn = connect(path)
+    try:
+        return pd.read_sql_query(f"SELECT * FROM {table}", conn)
+    finally:
+        conn.close()
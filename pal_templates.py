@@ -0,0 +1,81 @@
+"""Registry of known provider file templates.
+
+A template is identified by its provider and normalized header layout.
+Per-template facts learned while ingesting (date formats per column, field
+mappings) are persisted here so repeat files skip the inference work.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.environ.get("PAL_DATA_DIR", ".pal_data"), "templates.json")
+
+
+def template_key(provider, columns):
+    """Stable key for a provider's header layout"""
+    header = "\x1f".join(str(col).strip().lower() for col in columns)
+    digest = hashlib.sha1(header.encode()).hexdigest()[:12]
+    return f"{provider}:{digest}"
+
+
+class TemplateRegistry:
+    """JSON-backed store of per-template metadata"""
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._templates = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._templates = json.load(f)
+
+    def get(self, key):
+        """Copy of a template's metadata, or None if it is unknown"""
+        with self._lock:
+            template = self._templates.get(key)
+            return copy.deepcopy(template) if template is not None else None
+
+    def register(self, key, provider, columns):
+        """Record a template layout if it has not been seen before"""
+        with self._lock:
+            if key not in self._templates:
+                self._templates[key] = {"provider": provider, "columns": [str(c) for c in columns]}
+                self._save()
+
+    def date_format(self, key, column):
+        with self._lock:
+            return self._templates.get(key, {}).get("date_formats", {}).get(column)
+
+    def set_date_format(self, key, column, fmt):
+        with self._lock:
+            template = self._templates.setdefault(key, {})
+            template.setdefault("date_formats", {})[column] = fmt
+            self._save()
+
+    def field_mapping(self, key):
+        """Stored field mapping for a template, or None"""
+        with self._lock:
+            mapping = self._templates.get(key, {}).get("field_mapping")
+            return copy.deepcopy(mapping) if mapping is not None else None
+
+    def set_field_mapping(self, key, columns, confirmed=True):
+        """Store a template's column mapping, bumping its version"""
+        with self._lock:
+            template = self._templates.setdefault(key, {})
+            version = template.get("field_mapping", {}).get("version", 0) + 1
+            template["field_mapping"] = {"version": version, "confirmed": confirmed, "columns": columns}
+            self._save()
+            return version
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._templates, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)